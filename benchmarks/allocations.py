@@ -0,0 +1,57 @@
+'''
+   Measures the memory kept alive by building the query from profile_norm.py
+     (8 builder calls), using tracemalloc.  Exits non-zero when a query
+     needs more than the limits below, so it can guard against regressions.
+'''
+import sys
+import tracemalloc
+
+from norm import SELECT
+
+_queries = 10000
+
+# limits for one built query, with some headroom over what it takes now
+MAX_BLOCKS_PER_QUERY = 24
+MAX_BYTES_PER_QUERY = 1800
+
+
+def build():
+    return (SELECT('users.name',
+                   'users.fullname',
+                   'addresses.email_address')
+            .FROM('users')
+            .JOIN('addresses', ON='users.id = addresses.user_id')
+            .WHERE('users.id > %(user_id)s').bind(user_id=1)
+            .WHERE("users.name LIKE %(name)s")
+            .bind(name='Justin%'))
+
+
+def measure(count=_queries):
+    build()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    queries = [build() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del queries
+    return blocks / count, size / count
+
+
+def run_benchmark():
+    blocks, size = measure()
+    print(f'{"blocks/query":>13} {"bytes/query":>12}')
+    print(f'{blocks:>13.1f} {size:>12.1f}')
+
+    if blocks > MAX_BLOCKS_PER_QUERY or size > MAX_BYTES_PER_QUERY:
+        print(f'over the limit of {MAX_BLOCKS_PER_QUERY} blocks and '
+              f'{MAX_BYTES_PER_QUERY} bytes per query', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmark())
@@ -0,0 +1,59 @@
+'''
+   Times rendering a query with AsIs binds (.query) and rendering it for the
+     log (._loggable_query) with 1, 100 and 5000 binds, next to the old
+     replace-per-bind approach, which is O(binds * query length).
+'''
+from time import monotonic
+
+from norm import SELECT
+from norm.norm import NormAsIs
+
+_bind_counts = (1, 100, 5000)
+_repeats = 20
+
+
+def make_query(count):
+    s = SELECT('user_id').FROM('users')
+    for ix in range(count):
+        if ix % 10 == 0:
+            s = s.WHERE(**{f'col_{ix}': NormAsIs('now()')})
+        else:
+            s = s.WHERE(**{f'col_{ix}': ix})
+    return s
+
+
+def replace_loggable_query(s):
+    s.query
+    query = s._query
+    final_binds = dict(s.bind_items)
+    for key in sorted(final_binds, key=len, reverse=True):
+        value = final_binds[key]
+        if NormAsIs.isasis(value):
+            query = query.replace(s.bnd(key), value.value)
+    for key, value in s.binds.items():
+        query = query.replace(s.bnd(key), repr(value))
+    return query
+
+
+def time_it(func, s):
+    start = monotonic()
+    for _ in range(_repeats):
+        func(s)
+    return (monotonic() - start) / _repeats
+
+
+def run_benchmark():
+    print(f'{"binds":>6} {".query ms":>10} {"loggable ms":>12} '
+          f'{"replace ms":>11}')
+    for count in _bind_counts:
+        s = make_query(count)
+        assert s._loggable_query == replace_loggable_query(s)
+        query = time_it(lambda s: s.query, s)
+        loggable = time_it(lambda s: s._loggable_query, s)
+        replace = time_it(replace_loggable_query, s)
+        print(f'{count:>6} {query * 1000:>10.3f} {loggable * 1000:>12.3f} '
+              f'{replace * 1000:>11.3f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,125 @@
+'''
+   Times compile() alone, without the compile cache, for SELECT, UPDATE and
+     DELETE chains of 5, 50 and 500 clauses.  Then times compiling a few
+     new clauses on top of an already compiled SELECT of that size, from
+     scratch and reusing the parent's sections.
+'''
+from time import monotonic
+
+from norm import SELECT
+from norm import UPDATE
+from norm import DELETE
+from norm.norm import compile
+from norm.norm import compile_cache
+
+_clause_counts = (5, 50, 500)
+_repeats = 2000
+_rounds = 5
+
+
+def make_select(count):
+    s = SELECT().FROM('users AS u')
+    for ix in range(count):
+        step = ix % 5
+        if step == 0:
+            s = s.SELECT(f'u.col_{ix}')
+        elif step == 1:
+            s = s.WHERE(f'u.col_{ix} = %(col_{ix})s')
+        elif step == 2:
+            s = s.LEFTJOIN(f'table_{ix} AS t{ix}',
+                           ON=f't{ix}.user_id = u.user_id')
+        elif step == 3:
+            s = s.WHERE(f'(t{ix - 1}.flag OR\n t{ix - 1}.other_flag)')
+        else:
+            s = s.ORDER_BY(f'u.col_{ix}')
+    return s
+
+
+def make_update(count):
+    u = UPDATE('users')
+    for ix in range(count):
+        step = ix % 4
+        if step in (0, 1):
+            u = u.SET(f'col_{ix} = %(col_{ix})s')
+        elif step == 2:
+            u = u.WHERE(f'col_{ix} > 0')
+        else:
+            u = u.RETURNING(f'col_{ix}')
+    return u
+
+
+def make_delete(count):
+    d = DELETE('users')
+    for ix in range(count):
+        if ix % 5 == 4:
+            d = d.RETURNING(f'col_{ix}')
+        else:
+            d = d.WHERE(f'col_{ix} = %(col_{ix})s')
+    return d
+
+
+def time_compile(query, repeats):
+    # the best of a few rounds, which is the least disturbed by the machine
+    chain = query.build_chain()
+    query_type = query.query_type
+    best = None
+    for _ in range(_rounds):
+        start = monotonic()
+        for _ in range(repeats):
+            compile(chain, query_type)
+        elapsed = (monotonic() - start) / repeats
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def make_children(base, count):
+    # every child's SQL is new, so none come out of the compile cache
+    return [base.WHERE(f'u.extra_{ix} = %(extra)s')
+            .ORDER_BY('u.name')
+            .LIMIT(10)
+            for ix in range(count)]
+
+
+def time_child_compile(base, repeats):
+    base.query
+    full = incremental = None
+    for _ in range(_rounds):
+        children = make_children(base, repeats)
+        start = monotonic()
+        for child in children:
+            compile(child.build_chain(), child.query_type)
+        elapsed = (monotonic() - start) / repeats
+        if full is None or elapsed < full:
+            full = elapsed
+
+        compile_cache.clear()
+        start = monotonic()
+        for child in children:
+            child._compile_sections()
+        elapsed = (monotonic() - start) / repeats
+        if incremental is None or elapsed < incremental:
+            incremental = elapsed
+    return full, incremental
+
+
+def run_benchmark():
+    print(f'{"query":>7} {"clauses":>8} {"us/compile":>11}')
+    for name, make in (('SELECT', make_select),
+                       ('UPDATE', make_update),
+                       ('DELETE', make_delete)):
+        for count in _clause_counts:
+            repeats = max(_repeats * 5 // count, 20)
+            elapsed = time_compile(make(count), repeats)
+            print(f'{name:>7} {count:>8} {elapsed * 1e6:>11.2f}')
+
+    print()
+    print(f'{"base clauses":>12} {"full us":>8} {"incremental us":>15}')
+    for count in _clause_counts:
+        repeats = max(_repeats * 5 // count, 20)
+        full, incremental = time_child_compile(make_select(count), repeats)
+        print(f'{count:>12} {full * 1e6:>8.2f} {incremental * 1e6:>15.2f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
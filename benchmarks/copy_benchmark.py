@@ -0,0 +1,82 @@
+'''
+   Compares loading rows into a local postgresql database with batched
+     INSERTs against COPY FROM STDIN.
+'''
+from time import monotonic
+
+import psycopg2
+
+from norm.norm_psycopg2 import PG_ConnectionFactory
+from norm.norm_psycopg2 import PG_COPY
+from norm.norm_psycopg2 import PG_INSERT
+
+_row_count = 500000
+
+setup_ddl = '''\
+DROP TABLE IF EXISTS norm_copy_bench;
+
+CREATE TABLE norm_copy_bench (
+  user_id INTEGER,
+  name VARCHAR(255),
+  fullname VARCHAR(255),
+  email_address VARCHAR(255));'''
+
+
+def make_db_conn():
+    return psycopg2.connect(dbname='scratch')
+
+
+def fake_users():
+    for user_id in range(_row_count):
+        yield {'user_id': user_id,
+               'name': 'Bob',
+               'fullname': 'Bob Loblaw',
+               'email_address': 'bob@loblaw.com'}
+
+
+columns = ['user_id', 'name', 'fullname', 'email_address']
+cf = PG_ConnectionFactory(make_db_conn)
+
+
+def setup_db():
+    conn = cf()
+    conn.execute(setup_ddl)
+    conn.commit()
+
+
+def insert_bench():
+    conn = cf()
+    for i in PG_INSERT('norm_copy_bench',
+                       fake_users(),
+                       columns=columns).chunks(max_rows=5000):
+        conn.execute(i)
+    conn.commit()
+
+
+def copy_bench():
+    conn = cf()
+    conn.execute(PG_COPY('norm_copy_bench', fake_users(), columns=columns))
+    conn.commit()
+
+
+def time_load(f, last=None):
+    setup_db()
+    start = monotonic()
+    f()
+    elapsed = monotonic() - start
+    faster = 1
+    if last is not None:
+        faster = last / elapsed
+    print(f'*** Begin {f.__name__}')
+    print(f'Elapsed Time: {elapsed:.4f}')
+    print(f'Faster than INSERT factor: {faster:.4f}')
+    return elapsed
+
+
+def run_benchmark():
+    insert_time = time_load(insert_bench)
+    time_load(copy_bench, insert_time)
+
+
+if __name__ == '__main__':
+    run_benchmark()
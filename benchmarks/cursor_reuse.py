@@ -0,0 +1,52 @@
+'''
+   Compares thousands of small point lookups with a new cursor per call
+     against one cursor reused for the whole run (reuse_cursor=True).
+'''
+from time import monotonic
+import sqlite3
+
+from norm.norm_sqlite3 import SQLI_ConnectionFactory as ConnectionFactory
+from norm.norm_sqlite3 import SQLI_SELECT as SELECT
+
+_row_count = 10000
+_lookups = 20000
+
+
+def conn_maker():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        '''CREATE TABLE users (
+               user_id INTEGER PRIMARY KEY,
+               name VARCHAR(64)
+        )''')
+    conn.executemany('INSERT INTO users VALUES (?, ?)',
+                     ((user_id, f'user {user_id}')
+                      for user_id in range(_row_count)))
+    conn.commit()
+    return conn
+
+
+def time_lookups(reuse_cursor):
+    conn = ConnectionFactory(conn_maker, reuse_cursor=reuse_cursor)()
+    s = SELECT('name').FROM('users').WHERE('user_id = :user_id')
+    sql = s.query
+
+    start = monotonic()
+    for ix in range(_lookups):
+        conn.run_queryone(sql, {'user_id': ix % _row_count})
+    elapsed = monotonic() - start
+    conn.close()
+    return elapsed
+
+
+def run_benchmark():
+    print(f'{"mode":>14} {"seconds":>10} {"usec/lookup":>12}')
+    for reuse_cursor in (False, True):
+        mode = 'reused cursor' if reuse_cursor else 'new cursor'
+        elapsed = time_lookups(reuse_cursor)
+        print(f'{mode:>14} {elapsed:>10.4f} '
+              f'{elapsed / _lookups * 10**6:>12.2f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,37 @@
+'''
+   Shows that compiling a multi-row INSERT (SQL text plus binds) scales
+     linearly with the number of rows.
+'''
+from time import monotonic
+
+from norm.norm_sqlite3 import SQLI_INSERT as INSERT
+
+_row_counts = (10, 100, 1000, 10000, 100000)
+
+
+def make_rows(count):
+    return [{'user_id': user_id,
+             'name': 'Bob',
+             'fullname': 'Bob Loblaw',
+             'email_address': 'bob@loblaw.com'}
+            for user_id in range(count)]
+
+
+def time_compile(rows):
+    start = monotonic()
+    i = INSERT('users', rows)
+    i.query
+    i.binds
+    return monotonic() - start
+
+
+def run_benchmark():
+    print(f'{"rows":>8} {"seconds":>10} {"usec/row":>10}')
+    for count in _row_counts:
+        rows = make_rows(count)
+        elapsed = time_compile(rows)
+        print(f'{count:>8} {elapsed:>10.4f} {elapsed / count * 10**6:>10.2f}')
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -7,7 +7,6 @@ from tempfile import mktemp
 import tracemalloc
 
 import sqlite3
-import itertools
 
 from norm.norm_sqlite3 import SQLI_INSERT
 from norm.norm_sqlite3 import SQLI_SELECT
@@ -18,7 +17,6 @@ from norm.norm_sqlite3 import SQLI_ConnectionFactory
 
 _sqlite_source_db_fn = mktemp()
 _sqlite_dest_db_fn = mktemp()
-_chunk_size = 50
 
 
 def make_source_db_conn():
@@ -36,18 +34,11 @@ source_db_cf = SQLI_ConnectionFactory(make_source_db_conn)
 dest_db_cf = SQLI_ConnectionFactory(make_dest_db_conn)
 
 
-def chunk_up(iterable, size):
-    it = iter(iterable)
-    while True:
-        chunk = tuple(itertools.islice(it, size))
-        if not chunk:
-            break
-        yield chunk
-
-
-def shuttle_rows(source_cur, dest_cur, table_name, chunk_size=_chunk_size):
-    for chunk in chunk_up(source_cur, chunk_size):
-        dest_cur.execute(SQLI_INSERT(table_name, chunk))
+def shuttle_rows(source_cur, dest_cur, table_name):
+    # SQLI_INSERT knows how many bind parameters sqlite accepts, chunks()
+    #   splits the stream of rows into statements that fit
+    for chunk in SQLI_INSERT(table_name, source_cur).chunks():
+        dest_cur.execute(chunk)
 
 
 clean_up_source_table = '''\
@@ -132,8 +123,7 @@ def run_example_all():
     all_rows = source_cur.fetchall()
 
     # we still have to insert in chunks due to sqlite limits
-    for rows in chunk_up(all_rows, _chunk_size):
-        i = SQLI_INSERT('norm_shuttle_example_dest', rows)
+    for i in SQLI_INSERT('norm_shuttle_example_dest', all_rows).chunks():
         dest_cur.execute(i)
     dest_conn.commit()
     end = monotonic()
@@ -12,10 +12,16 @@ from .norm import NOT_EXISTS
 from norm.rows import RowsProxy
 from norm.connection import ConnectionProxy
 from norm.connection import ConnectionFactory
+from norm.connection import PooledConnectionFactory
 from norm.connection import CursorProxy
+from norm.async_connection import AsyncConnectionFactory
 
 enable_logging = False
 max_query_log_length = 5000
+# only queries taking at least this long are logged
+slow_query_ms = int(os.getenv('NORM_SLOW_QUERY_MS', 0))
+# the share of queries over slow_query_ms that are logged
+log_sample_rate = float(os.getenv('NORM_LOG_SAMPLE_RATE', 1))
 
 if int(os.getenv('NORM_LOG_QUERIES', 0)):
     enable_logging = True
@@ -33,4 +39,6 @@ __all__ = [SELECT,
            RowsProxy,
            ConnectionProxy,
            ConnectionFactory,
-           CursorProxy]
+           PooledConnectionFactory,
+           CursorProxy,
+           AsyncConnectionFactory]
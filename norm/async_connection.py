@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+
+
+class AsyncCursorProxy(object):
+    iter_batch_size = 1000
+
+    def __init__(self, cursor, connection):
+        self.cursor = cursor
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def _run(self, func, *args, **kw):
+        return self.connection._run(func, *args, **kw)
+
+    async def execute(self, query, params=None):
+        return await self._run(self.cursor.execute, query, params)
+
+    async def executemany(self, query, seq_of_params=None):
+        return await self._run(self.cursor.executemany, query, seq_of_params)
+
+    async def run_query(self, query, params=None):
+        return await self._run(self.cursor.run_query, query, params)
+
+    async def run_queryone(self, query, params=None):
+        return await self._run(self.cursor.run_queryone, query, params)
+
+    async def fetchall(self):
+        return await self._run(self.cursor.fetchall)
+
+    async def fetchmany(self, count):
+        return await self._run(self.cursor.fetchmany, count)
+
+    async def fetchone(self):
+        return await self._run(self.cursor.fetchone)
+
+    async def close(self):
+        return await self._run(self.cursor.close)
+
+    async def __aiter__(self):
+        while True:
+            rows = await self.fetchmany(self.iter_batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+
+class AsyncConnectionProxy(object):
+    # Runs a blocking norm ConnectionProxy on its own single thread, which
+    #   keeps drivers that are tied to the creating thread (sqlite3) happy.
+    cursor_proxy = AsyncCursorProxy
+
+    def __init__(self, conn, executor=None):
+        self.conn = conn
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1)
+        self.executor = executor
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    async def _run(self, func, *args, **kw):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          partial(func, *args, **kw))
+
+    async def cursor(self, *args, **kw):
+        cur = await self._run(self.conn.cursor, *args, **kw)
+        return self.cursor_proxy(cur, self)
+
+    async def execute(self, query, params=None):
+        return await self._run(self.conn.execute, query, params)
+
+    async def executemany(self, query, seq_of_params=None, **kw):
+        return await self._run(self.conn.executemany,
+                               query,
+                               seq_of_params,
+                               **kw)
+
+    async def insert_many(self, table, rows, **kw):
+        return await self._run(self.conn.insert_many, table, rows, **kw)
+
+    async def run_query(self, query, params=None, cache=True):
+        return await self._run(self.conn.run_query, query, params, cache)
+
+    async def run_queryone(self, query, params=None, cache=True):
+        return await self._run(self.conn.run_queryone, query, params, cache)
+
+    async def stream_query(self, query, params=None, batch_size=None):
+        # the connection's own streaming (a server side cursor where the
+        #   driver has one), pulled a batch at a time on its thread
+        batches = self.conn.stream_query(query,
+                                         params,
+                                         batch_size=batch_size,
+                                         batches=True)
+        try:
+            while True:
+                rows = await self._run(next, batches, None)
+                if rows is None:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            await self._run(batches.close)
+
+    async def commit(self):
+        return await self._run(self.conn.commit)
+
+    async def rollback(self):
+        return await self._run(self.conn.rollback)
+
+    async def close(self):
+        try:
+            await self._run(self.conn.close)
+        finally:
+            if self._owns_executor:
+                self.executor.shutdown(wait=False)
+
+
+class AsyncConnectionFactory(object):
+    connection_proxy = AsyncConnectionProxy
+
+    def __init__(self, connection_factory):
+        self.connection_factory = connection_factory
+
+    async def __call__(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.get_running_loop()
+        try:
+            conn = await loop.run_in_executor(executor,
+                                              self.connection_factory)
+        except Exception:
+            executor.shutdown(wait=False)
+            raise
+        proxy = self.connection_proxy(conn, executor)
+        proxy._owns_executor = True
+        return proxy
+
+
+__all__ = [AsyncCursorProxy,
+           AsyncConnectionProxy,
+           AsyncConnectionFactory]
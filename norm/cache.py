@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class LRUCache(object):
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            evicted = []
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False))
+                self.evictions += 1
+        for old_key, old_value in evicted:
+            self.evicted(old_key, old_value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def evicted(self, key, value):
+        pass
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    @property
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize}
+
+
+class ResultCache(LRUCache):
+    # An LRU whose entries also expire ttl seconds after they were stored,
+    #   and can be dropped by the tables they were read from.
+    def __init__(self, maxsize=1024, ttl=None):
+        super().__init__(maxsize=maxsize)
+        self.ttl = ttl
+        self._keys_by_table = {}
+
+    def get_result(self, key):
+        entry = self.get(key)
+        if entry is None:
+            return None
+        expires, tables, result = entry
+        if expires is not None and monotonic() >= expires:
+            self._drop(key)
+            return None
+        return result
+
+    def set_result(self, key, result, tables=()):
+        expires = None
+        if self.ttl is not None:
+            expires = monotonic() + self.ttl
+        tables = frozenset(tables)
+        with self._lock:
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+        self.set(key, (expires, tables, result))
+
+    def evicted(self, key, entry):
+        self._unindex(key, entry[1])
+
+    def _unindex(self, key, tables):
+        with self._lock:
+            for table in tables:
+                keys = self._keys_by_table.get(table)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+    def _drop(self, key):
+        entry = self.pop(key)
+        if entry is not None:
+            self._unindex(key, entry[1])
+
+    def invalidate(self, *tables):
+        for table in tables:
+            with self._lock:
+                keys = self._keys_by_table.pop(table, ())
+            for key in keys:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._keys_by_table.clear()
+
+
+__all__ = [LRUCache, ResultCache]
@@ -1,7 +1,30 @@
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from threading import Condition
 from time import monotonic
-import sys
+
+import re
 
 import norm
+from norm import instrumentation
+from norm import query_log
+from norm.instrumentation import AFTER_EXECUTE
+from norm.instrumentation import BEFORE_EXECUTE
+from norm.instrumentation import ON_CONNECT
+from norm.instrumentation import ON_ERROR
+from norm.instrumentation import ConnectEvent
+from norm.norm import DELETE
+from norm.norm import EXECUTEMANY_MODE
+from norm.norm import INSERT
+from norm.norm import RETURNING
+from norm.norm import SELECT
+from norm.norm import UNION
+from norm.norm import UPDATE
+from norm.norm import WITH
+from norm.norm import table_name
+from norm.norm import bind_positions
+from norm.norm import splice_binds
 from norm.rows import RowsProxy
 
 
@@ -14,9 +37,135 @@ def _to_query_binds(q, params):
         return q, params
 
 
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _returns_rows(query):
+    if isinstance(query, INSERT):
+        return bool(query.returning)
+    if isinstance(query, (UPDATE, DELETE)):
+        return any(op == RETURNING for op, option in query.build_chain())
+    return True
+
+
+def _can_batch(query, params):
+    return (getattr(query, 'batchable', False) and
+            getattr(query, 'mode', None) != EXECUTEMANY_MODE)
+
+
+def _merge_batch(queries):
+    # joins statements into one, prefixing every bind name with the
+    #   statement's position so binds from different statements never clash
+    sql_parts = []
+    merged_binds = {}
+    for ix, query in enumerate(queries):
+        prefix, postfix = query.bind_prefix, query.bind_postfix
+        sql, binds = query.query, query.binds
+        if not binds:
+            sql_parts.append((sql, prefix))
+            continue
+
+        namespace = f'b{ix}_'
+        renames = {name: prefix + namespace + name + postfix
+                   for name in binds}
+        sql_parts.append((splice_binds(sql,
+                                       bind_positions(sql, prefix, postfix),
+                                       renames),
+                          None))
+        for name, value in binds.items():
+            merged_binds[namespace + name] = value
+
+    # a statement without binds was written to run without any, so once
+    #   the batch has binds its percent signs need escaping for pyformat
+    sql_query = []
+    for sql, prefix in sql_parts:
+        if merged_binds and prefix is not None and '%' in prefix:
+            sql = sql.replace('%', '%%')
+        sql_query.append(sql)
+    return '\n'.join(sql_query), merged_binds
+
+
+_written_table = re.compile(
+    r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)'
+    r'\s+([^\s(),;]+)',
+    re.IGNORECASE)
+
+
+def _written_tables(query):
+    if isinstance(query, (INSERT, UPDATE, DELETE)):
+        return query.table_names
+    if isinstance(query, WITH):
+        tables = frozenset()
+        for cte in query.tables.values():
+            tables |= _written_tables(cte)
+        if query.primary is not None:
+            tables |= _written_tables(query.primary)
+        return tables
+    if isinstance(query, str):
+        match = _written_table.match(query)
+        if match is not None:
+            return frozenset([table_name(match.group(1))])
+    return frozenset()
+
+
+def _result_key(query):
+    if isinstance(query, WITH):
+        # a data-modifying CTE makes the whole statement a write
+        for part in (query.primary, *query.tables.values()):
+            if not isinstance(part, (SELECT, UNION)):
+                return None
+    elif not isinstance(query, (SELECT, UNION)):
+        return None
+    try:
+        key = (query.query, frozenset(query.binds.items()))
+        hash(key)
+    except TypeError:
+        # a list or other unhashable bind, which can't key the cache
+        return None
+    return key
+
+
+def _compact_rows(rows):
+    column_names = rows.column_names
+    return tuple(tuple(row[name] for name in column_names)
+                 if hasattr(row, 'get') else tuple(row)
+                 for row in rows.rows)
+
+
+class Batch(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = []
+        self.results = None
+
+    def add(self, query, params=None):
+        self.statements.append((query, params))
+        return len(self.statements) - 1
+
+    def execute(self):
+        statements, self.statements = self.statements, []
+        self.results = self.connection._run_batch(statements)
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+
 class CursorProxy(object):
+    # False when rendering a query for the log needs the live cursor
+    defer_log_rendering = True
+
     def __init__(self, cursor):
         self.cursor = cursor
+        self._event = None
 
     def __getattr__(self, name):
         return getattr(self.cursor, name)
@@ -28,31 +177,98 @@ class CursorProxy(object):
         return [d[0] for d in self.description]
 
     def execute(self, query, params=None):
+        if getattr(query, 'mode', None) == EXECUTEMANY_MODE:
+            return self.executemany(query)
+
+        instrumented = instrumentation.enabled
+        self._event = None
+        if instrumented:
+            compile_start = monotonic()
         sql_query, sql_binds = _to_query_binds(query, params)
+        if instrumented:
+            self._start_event(query, sql_query, sql_binds, compile_start)
+
         start = monotonic()
-        if sql_binds:
-            res = self.cursor.execute(sql_query, sql_binds)
-        else:
-            res = self.cursor.execute(sql_query)
+        try:
+            if sql_binds:
+                res = self.cursor.execute(sql_query, sql_binds)
+            else:
+                res = self.cursor.execute(sql_query)
+        except Exception as e:
+            if instrumented:
+                self._fail_event(e)
+            raise
+        end = monotonic()
+
+        if instrumented:
+            self._finish_event(end - start)
+        if norm.enable_logging:
+            try:
+                self._log_query(end - start, partial(
+                    self._query_to_log, query, sql_query, sql_binds))
+            except Exception:
+                pass
+        return res
+
+    def executemany(self, query, seq_of_params=None, page_size=None):
+        # page_size is only used by drivers that can page rows
+        instrumented = instrumentation.enabled
+        self._event = None
+        if instrumented:
+            compile_start = monotonic()
+        sql_query, sql_binds = _to_query_binds(query, seq_of_params)
+        if instrumented:
+            self._start_event(query, sql_query, None, compile_start)
+
+        start = monotonic()
+        try:
+            res = self.cursor.executemany(sql_query, sql_binds)
+        except Exception as e:
+            if instrumented:
+                self._fail_event(e)
+            raise
         end = monotonic()
 
+        if instrumented:
+            self._finish_event(end - start)
         if norm.enable_logging:
             try:
-                loggable_query = self._query_to_log(
-                    query, sql_query, sql_binds)
-                loggable_query = loggable_query[:norm.max_query_log_length]
-                print(
-                    f'\nQuery took {end-start:.2f} seconds:\n'
-                    f'{loggable_query}\n\n',
-                    file=sys.stderr)
+                self._log_query(end - start, sql_query)
             except Exception:
                 pass
         return res
 
+    def _start_event(self, query, sql_query, sql_binds, compile_start):
+        event = self._event = instrumentation.QueryEvent(
+            query, sql_query, sql_binds, monotonic() - compile_start)
+        instrumentation.fire(BEFORE_EXECUTE, event)
+
+    def _finish_event(self, execute_time):
+        event = self._event
+        event.execute_time = execute_time
+        rowcount = getattr(self.cursor, 'rowcount', -1)
+        if rowcount is not None and rowcount >= 0:
+            event.row_count = rowcount
+        instrumentation.fire(AFTER_EXECUTE, event)
+
+    def _fail_event(self, error):
+        event, self._event = self._event, None
+        event.error = error
+        instrumentation.fire(ON_ERROR, event)
+
+    def _log_query(self, duration, loggable_query):
+        # loggable_query is the text or a function making it, which is only
+        #   called when the record is written by the logging thread
+        if not query_log.wants(duration):
+            return
+        if callable(loggable_query) and not self.defer_log_rendering:
+            loggable_query = loggable_query()
+        query_log.log_query(duration, loggable_query)
+
     def _query_to_log(self, query, sql_query, params):
-        if hasattr(query, '_loggable_query'):
-            loggable_query = query._loggable_query
-        else:
+        # hasattr would render the query once just to check for it
+        loggable_query = getattr(query, '_loggable_query', None)
+        if loggable_query is None:
             loggable_query = sql_query
         return loggable_query
 
@@ -66,13 +282,35 @@ class CursorProxy(object):
         return result
 
     def fetchall(self):
-        return RowsProxy(self.cursor.fetchall(), self.column_names)
+        if self._event is None:
+            rows = self.cursor.fetchall()
+        else:
+            start = monotonic()
+            rows = self.cursor.fetchall()
+            self._event.fetched(len(rows), monotonic() - start)
+        return RowsProxy(rows,
+                         self.column_names,
+                         self.description)
 
     def fetchmany(self, count):
-        return RowsProxy(self.cursor.fetchmany(count), self.column_names)
+        if self._event is None:
+            rows = self.cursor.fetchmany(count)
+        else:
+            start = monotonic()
+            rows = self.cursor.fetchmany(count)
+            self._event.fetched(len(rows), monotonic() - start)
+        return RowsProxy(rows,
+                         self.column_names,
+                         self.description)
 
     def fetchone(self):
-        row = self.cursor.fetchone()
+        if self._event is None:
+            row = self.cursor.fetchone()
+        else:
+            start = monotonic()
+            row = self.cursor.fetchone()
+            self._event.fetched(0 if row is None else 1,
+                                monotonic() - start)
         if row is None:
             return row
         return dict(zip(self.column_names, row))
@@ -84,9 +322,20 @@ class CursorProxy(object):
 
 class ConnectionProxy(object):
     cursor_proxy = CursorProxy
-
-    def __init__(self, conn):
+    insert_query = INSERT
+    stream_batch_size = 1000
+    # can several statements be sent in one execute call
+    batch_statements = False
+    # the PooledConnectionFactory this connection was checked out from
+    pool = None
+
+    def __init__(self, conn, reuse_cursor=False, result_cache=None):
         self.conn = conn
+        self.reuse_cursor = reuse_cursor
+        self._cached_cursor = None
+        self.result_cache = result_cache
+        # tables written since the last commit or rollback
+        self._written = set()
 
     def __getattr__(self, name):
         return getattr(self.conn, name)
@@ -94,24 +343,232 @@ class ConnectionProxy(object):
     def cursor(self, *args, **kw):
         return self.cursor_proxy(self.conn.cursor(*args, **kw))
 
-    def execute(self, query, params=None):
-        cur = self.cursor()
+    @contextmanager
+    def _borrow_cursor(self):
+        if not self.reuse_cursor:
+            cur = self.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+            return
+
+        # the cached cursor is taken out while in use so a nested call
+        #   can never share it, and is dropped if anything goes wrong
+        cur, self._cached_cursor = self._cached_cursor, None
+        if cur is None:
+            cur = self.cursor()
         try:
+            yield cur
+        except BaseException:
+            _close_quietly(cur)
+            raise
+        if self._cached_cursor is None:
+            self._cached_cursor = cur
+        else:
+            cur.close()
+
+    def _drop_cached_cursor(self):
+        cur, self._cached_cursor = self._cached_cursor, None
+        if cur is not None:
+            _close_quietly(cur)
+
+    def _note_write(self, query):
+        if self.result_cache is None:
+            return
+        tables = _written_tables(query)
+        if tables:
+            self._written |= tables
+            self.result_cache.invalidate(*tables)
+
+    def invalidate_results(self, *tables):
+        if self.result_cache is not None:
+            self.result_cache.invalidate(*[table_name(table)
+                                           for table in tables])
+
+    def _end_transaction(self):
+        written, self._written = self._written, set()
+        if written and self.result_cache is not None:
+            # drop anything read from these tables while the transaction
+            #   was open, it may have seen uncommitted rows
+            self.result_cache.invalidate(*written)
+
+    def execute(self, query, params=None):
+        self._note_write(query)
+        with self._borrow_cursor() as cur:
             cur.execute(query, params)
+
+    def executemany(self, query, seq_of_params=None, **kw):
+        self._note_write(query)
+        with self._borrow_cursor() as cur:
+            cur.executemany(query, seq_of_params, **kw)
+
+    def insert_many(self,
+                    table,
+                    rows,
+                    max_params=None,
+                    max_rows=None,
+                    max_bytes=None,
+                    **kw):
+        insert = self.insert_query(table, rows, **kw)
+        self._note_write(insert)
+        with self._borrow_cursor() as cur:
+            for chunk in insert.chunks(max_params=max_params,
+                                       max_rows=max_rows,
+                                       max_bytes=max_bytes):
+                cur.execute(chunk)
+
+    def run_query(self, query, params=None, cache=True):
+        if self.result_cache is not None:
+            return self._cached_run_query(query, params, cache)
+        with self._borrow_cursor() as cur:
+            return cur.run_query(query, params)
+
+    def run_queryone(self, query, params=None, cache=True):
+        if self.result_cache is not None:
+            return self._cached_run_queryone(query, params, cache)
+        with self._borrow_cursor() as cur:
+            return cur.run_queryone(query, params)
+
+    def _cache_key(self, query, cache):
+        if not cache:
+            return None
+        key = _result_key(query)
+        # the cache is shared with other connections, which mustn't see
+        #   what this one read of its own uncommitted writes
+        if key is not None and self._written & query.table_names:
+            return None
+        return key
+
+    def _cached_run_query(self, query, params, cache):
+        key = self._cache_key(query, cache)
+        if key is None:
+            self._note_write(query)
+            with self._borrow_cursor() as cur:
+                return cur.run_query(query, params)
+
+        cached = self.result_cache.get_result(('all', key))
+        if cached is None:
+            with self._borrow_cursor() as cur:
+                rows = cur.run_query(query, params)
+            cached = (_compact_rows(rows), rows.column_names, rows.description)
+            self.result_cache.set_result(('all', key),
+                                         cached,
+                                         query.table_names)
+        rows, column_names, description = cached
+        return RowsProxy(list(rows), column_names, description)
+
+    def _cached_run_queryone(self, query, params, cache):
+        key = self._cache_key(query, cache)
+        if key is None:
+            self._note_write(query)
+            with self._borrow_cursor() as cur:
+                return cur.run_queryone(query, params)
+
+        cached = self.result_cache.get_result(('one', key))
+        if cached is None:
+            with self._borrow_cursor() as cur:
+                row = cur.run_queryone(query, params)
+            if row is None:
+                cached = (None, None)
+            else:
+                cached = (tuple(row.values()), tuple(row))
+            self.result_cache.set_result(('one', key),
+                                         cached,
+                                         query.table_names)
+        row, column_names = cached
+        if row is None:
+            return None
+        return dict(zip(column_names, row))
+
+    def batch(self):
+        return Batch(self)
+
+    def _batch_groups(self, statements):
+        # drivers only hand back the rows of the last statement they run,
+        #   so a statement returning rows always ends its group
+        if not self.batch_statements:
+            for statement in statements:
+                yield [statement]
+            return
+
+        group = []
+        for query, params in statements:
+            if not _can_batch(query, params):
+                if group:
+                    yield group
+                    group = []
+                yield [(query, params)]
+                continue
+            group.append((query, params))
+            if _returns_rows(query):
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def _run_batch(self, statements):
+        for query, params in statements:
+            self._note_write(query)
+        results = []
+        with self._borrow_cursor() as cur:
+            for group in self._batch_groups(statements):
+                if len(group) == 1:
+                    query, params = group[0]
+                else:
+                    query, params = _merge_batch([q for q, p in group])
+                cur.execute(query, params)
+
+                results.extend(RowsProxy([]) for statement in group[1:])
+                if cur.description is None:
+                    results.append(RowsProxy([]))
+                else:
+                    results.append(cur.fetchall())
+        return results
+
+    def commit(self):
+        self._drop_cached_cursor()
+        try:
+            return self.conn.commit()
         finally:
-            cur.close()
+            self._end_transaction()
 
-    def run_query(self, query, params=None):
-        cur = self.cursor()
+    def rollback(self):
+        self._drop_cached_cursor()
         try:
-            return cur.run_query(query, params)
+            return self.conn.rollback()
         finally:
-            cur.close()
+            self._end_transaction()
 
-    def run_queryone(self, query, params=None):
+    def close(self):
+        if self.pool is not None:
+            return self.pool.release(self)
+        self._drop_cached_cursor()
+        return self.conn.close()
+
+    def _stream_cursor(self, batch_size):
         cur = self.cursor()
+        cur.cursor.arraysize = batch_size
+        return cur
+
+    def stream_query(self,
+                     query,
+                     params=None,
+                     batch_size=None,
+                     batches=False):
+        if batch_size is None:
+            batch_size = self.stream_batch_size
+        cur = self._stream_cursor(batch_size)
         try:
-            return cur.run_queryone(query, params)
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                if batches:
+                    yield rows
+                else:
+                    yield from rows
         finally:
             cur.close()
 
@@ -119,25 +576,255 @@ class ConnectionProxy(object):
 class ConnectionFactory(object):
     connection_proxy = ConnectionProxy
 
-    def __init__(self, connection_maker):
+    def __init__(self,
+                 connection_maker,
+                 reuse_cursor=False,
+                 result_cache=None):
         self.connection_maker = connection_maker
+        self.reuse_cursor = reuse_cursor
+        self.result_cache = result_cache
 
     def __call__(self):
+        return self._connect()
+
+    def _proxy_options(self):
+        return {'reuse_cursor': self.reuse_cursor,
+                'result_cache': self.result_cache}
+
+    def _connect(self):
         start = monotonic()
-        conn = self.connection_proxy(self.connection_maker())
+        try:
+            conn = self.connection_proxy(self.connection_maker(),
+                                         **self._proxy_options())
+        except Exception as e:
+            if instrumentation.enabled:
+                instrumentation.fire(ON_ERROR, ConnectEvent(
+                    self.connection_maker, monotonic() - start, e))
+            raise
         end = monotonic()
 
+        if instrumentation.enabled:
+            instrumentation.fire(ON_CONNECT, ConnectEvent(
+                self.connection_maker, end - start))
+
         try:
             if norm.enable_logging:
-                print(f'\nConnecting to db with {self.connection_maker}'
-                      f' took {end-start:.2f} seconds',
-                      file=sys.stderr)
+                query_log.log_connect(end - start, self.connection_maker)
         except Exception:
             pass
 
         return conn
 
 
-__all__ = [CursorProxy,
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnectionFactory(ConnectionFactory):
+    health_check_query = 'SELECT 1'
+
+    def __init__(self,
+                 connection_maker,
+                 min_size=0,
+                 max_size=10,
+                 idle_timeout=None,
+                 max_lifetime=None,
+                 health_check=True,
+                 checkout_timeout=None,
+                 reuse_cursor=False,
+                 result_cache=None):
+        super().__init__(connection_maker,
+                         reuse_cursor=reuse_cursor,
+                         result_cache=result_cache)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = Condition()
+        # idle connections as (conn, returned_at), most recently used last
+        self._idle = deque()
+        self._created = {}
+        self._in_use = set()
+        self._size = 0
+        self._closed = False
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append((self._open(), monotonic()))
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _open(self):
+        # the caller has already counted this connection in _size
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        conn.pool = self
+        with self._cond:
+            self._created[conn] = monotonic()
+        return conn
+
+    def _forget(self, conn):
+        # called with the lock held.  Detached from the pool, closing the
+        #   connection closes the driver connection.
+        conn.pool = None
+        self._created.pop(conn, None)
+        self._size -= 1
+        self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self._forget(conn)
+        _close_quietly(conn)
+
+    def _top_up(self):
+        # opens connections to replace culled ones until min_size are open
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                # the next checkout will find out if the database is down
+                return
+            with self._cond:
+                self._idle.appendleft((conn, monotonic()))
+                self._cond.notify()
+
+    def _expired(self, conn, now):
+        if self.max_lifetime is None:
+            return False
+        return now - self._created.get(conn, now) > self.max_lifetime
+
+    def _usable(self, conn, returned_at, now):
+        if (self.idle_timeout is not None and
+                now - returned_at > self.idle_timeout):
+            return False
+        return not self._expired(conn, now)
+
+    def _healthy(self, conn):
+        if not self.health_check:
+            return True
+        try:
+            cur = conn.conn.cursor()
+            try:
+                cur.execute(self.health_check_query)
+                cur.fetchall()
+            finally:
+                cur.close()
+        except Exception:
+            return False
+        return True
+
+    def _checkout(self, deadline):
+        stale = []
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('This connection pool is closed')
+
+            now = monotonic()
+            while self._idle:
+                conn, returned_at = self._idle.pop()
+                if self._usable(conn, returned_at, now):
+                    return conn, stale, False
+                stale.append(conn)
+                self._forget(conn)
+
+            if self._size < self.max_size:
+                self._size += 1
+                return None, stale, True
+
+            if deadline is None:
+                self._cond.wait()
+            else:
+                remaining = deadline - monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise PoolTimeout('Timed out waiting for a connection')
+            return None, stale, False
+
+    def __call__(self):
+        if self.checkout_timeout is None:
+            deadline = None
+        else:
+            deadline = monotonic() + self.checkout_timeout
+
+        while True:
+            conn, stale, create = self._checkout(deadline)
+            for old_conn in stale:
+                _close_quietly(old_conn)
+            if stale:
+                self._top_up()
+            if create:
+                return self._hand_out(self._open())
+            if conn is not None:
+                if self._healthy(conn):
+                    return self._hand_out(conn)
+                self._discard(conn)
+
+    def _hand_out(self, conn):
+        with self._cond:
+            self._in_use.add(conn)
+        return conn
+
+    def release(self, conn, discard=False):
+        with self._cond:
+            if conn not in self._in_use:
+                # already released, by close() or the context manager
+                return
+            self._in_use.remove(conn)
+
+        if not discard and not self._closed:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed or self._expired(conn, monotonic()):
+            self._discard(conn)
+            self._top_up()
+            return
+
+        with self._cond:
+            self._idle.append((conn, monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, returned_at in self._idle]
+            self._idle.clear()
+            for conn in idle:
+                self._forget(conn)
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+
+__all__ = [Batch,
+           CursorProxy,
            ConnectionProxy,
-           ConnectionFactory]
+           ConnectionFactory,
+           PooledConnectionFactory,
+           PoolTimeout]
@@ -0,0 +1,224 @@
+from hashlib import sha1
+from math import ceil
+from math import log2
+from threading import Lock
+
+BEFORE_EXECUTE = 'before_execute'
+AFTER_EXECUTE = 'after_execute'
+AFTER_FETCH = 'after_fetch'
+ON_CONNECT = 'on_connect'
+ON_ERROR = 'on_error'
+
+_events = (BEFORE_EXECUTE, AFTER_EXECUTE, AFTER_FETCH, ON_CONNECT, ON_ERROR)
+
+hooks = {event: [] for event in _events}
+# checked on every query, so nothing is measured until a hook is added
+enabled = False
+
+
+def _update_enabled():
+    global enabled
+    enabled = any(hooks.values())
+
+
+def add_hook(event, func):
+    if event not in hooks:
+        raise ValueError(f'Unknown instrumentation event {event!r}')
+    hooks[event].append(func)
+    _update_enabled()
+
+
+def remove_hook(event, func):
+    try:
+        hooks[event].remove(func)
+    except (KeyError, ValueError):
+        pass
+    _update_enabled()
+
+
+def clear_hooks():
+    for funcs in hooks.values():
+        funcs.clear()
+    _update_enabled()
+
+
+def fire(event, info):
+    for func in hooks[event]:
+        func(info)
+
+
+class QueryEvent(object):
+    __slots__ = ('query',
+                 'sql',
+                 'bind_count',
+                 'compile_time',
+                 'execute_time',
+                 'fetch_time',
+                 'row_count',
+                 'rows_fetched',
+                 'batch_rows',
+                 'batch_fetch_time',
+                 'error',
+                 '_fingerprint')
+
+    def __init__(self, query, sql, binds, compile_time):
+        self.query = query
+        self.sql = sql
+        self.bind_count = len(binds) if binds else 0
+        self.compile_time = compile_time
+        self.execute_time = None
+        self.fetch_time = 0.0
+        self.row_count = None
+        self.rows_fetched = 0
+        # what the latest fetch call added
+        self.batch_rows = 0
+        self.batch_fetch_time = 0.0
+        self.error = None
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            fingerprint = getattr(self.query, 'fingerprint', None)
+            if fingerprint is None:
+                fingerprint = sha1(self.sql.encode('utf-8')).hexdigest()
+            self._fingerprint = fingerprint
+        return self._fingerprint
+
+    def fetched(self, row_count, fetch_time):
+        self.batch_rows = row_count
+        self.batch_fetch_time = fetch_time
+        self.fetch_time += fetch_time
+        self.rows_fetched += row_count
+        self.row_count = self.rows_fetched
+        fire(AFTER_FETCH, self)
+
+
+class ConnectEvent(object):
+    __slots__ = ('connection_maker', 'connect_time', 'error')
+
+    def __init__(self, connection_maker, connect_time, error=None):
+        self.connection_maker = connection_maker
+        self.connect_time = connect_time
+        self.error = error
+
+
+class Histogram(object):
+    # Log-scale buckets: each power of two above min_value is split into
+    #   buckets_per_doubling buckets, so a percentile is off by at most
+    #   2 ** (1 / buckets_per_doubling) - 1 (about 9% with the default 8).
+    def __init__(self, buckets_per_doubling=8, min_value=1e-6):
+        self.buckets_per_doubling = buckets_per_doubling
+        self.min_value = min_value
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        if value <= self.min_value:
+            ix = 0
+        else:
+            ix = ceil(log2(value / self.min_value) *
+                      self.buckets_per_doubling)
+        self.buckets[ix] = self.buckets.get(ix, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        wanted = p / 100 * self.count
+        seen = 0
+        for ix in sorted(self.buckets):
+            seen += self.buckets[ix]
+            if seen >= wanted:
+                upper = self.min_value * 2 ** (ix / self.buckets_per_doubling)
+                return min(upper, self.max)
+        return self.max
+
+
+class QueryStats(object):
+    # execute latency per query fingerprint, fed by the after_execute and
+    #   after_fetch hooks once installed
+    def __init__(self, buckets_per_doubling=8):
+        self.buckets_per_doubling = buckets_per_doubling
+        self._lock = Lock()
+        self._stats = {}
+
+    def _entry(self, event):
+        fingerprint = event.fingerprint
+        entry = self._stats.get(fingerprint)
+        if entry is None:
+            entry = self._stats[fingerprint] = {
+                'query': event.sql,
+                'latency': Histogram(self.buckets_per_doubling),
+                'fetch_time': 0.0,
+                'rows': 0,
+                'errors': 0}
+        return entry
+
+    def after_execute(self, event):
+        with self._lock:
+            self._entry(event)['latency'].add(event.execute_time)
+
+    def after_fetch(self, event):
+        with self._lock:
+            entry = self._entry(event)
+            entry['fetch_time'] += event.batch_fetch_time
+            entry['rows'] += event.batch_rows
+
+    def on_error(self, event):
+        if not isinstance(event, QueryEvent):
+            return
+        with self._lock:
+            self._entry(event)['errors'] += 1
+
+    def install(self):
+        add_hook(AFTER_EXECUTE, self.after_execute)
+        add_hook(AFTER_FETCH, self.after_fetch)
+        add_hook(ON_ERROR, self.on_error)
+
+    def uninstall(self):
+        remove_hook(AFTER_EXECUTE, self.after_execute)
+        remove_hook(AFTER_FETCH, self.after_fetch)
+        remove_hook(ON_ERROR, self.on_error)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def report(self):
+        report = {}
+        with self._lock:
+            for fingerprint, entry in self._stats.items():
+                latency = entry['latency']
+                report[fingerprint] = {
+                    'query': entry['query'],
+                    'count': latency.count,
+                    'errors': entry['errors'],
+                    'total': latency.total,
+                    'max': latency.max,
+                    'p50': latency.percentile(50),
+                    'p95': latency.percentile(95),
+                    'p99': latency.percentile(99),
+                    'fetch_time': entry['fetch_time'],
+                    'rows': entry['rows']}
+        return report
+
+    def slowest(self, count=10, by='p95'):
+        report = self.report()
+        return sorted(report.items(),
+                      key=lambda item: item[1][by] or 0,
+                      reverse=True)[:count]
+
+
+query_stats = QueryStats()
+
+
+__all__ = [QueryEvent,
+           ConnectEvent,
+           Histogram,
+           QueryStats]
@@ -1,4 +1,12 @@
+from hashlib import sha1
+from itertools import islice
+import copy
+import re
+from threading import Lock
+from types import MappingProxyType
+
 from .cached_property import cached_property
+from .cache import LRUCache
 
 QUERY_TYPE = 'qt'
 COLUMN = 'c'
@@ -17,6 +25,9 @@ RETURNING = 'r'
 DISTINCT_ON = 'do'
 JOIN_LATERAL = 'jl'
 
+VALUES_MODE = 'values'
+EXECUTEMANY_MODE = 'executemany'
+
 SELECT_QT = 's'
 UPDATE_QT = 'u'
 DELETE_QT = 'd'
@@ -65,6 +76,41 @@ class BogusQuery(Exception):
     pass
 
 
+def _class_key(o):
+    cls = type(o)
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _literal_key(value):
+    # literal SQL changes the statement, any other value is just a bind
+    if NormAsIs.isasis(value):
+        return ('AsIs', value.value)
+    getquoted = getattr(value, 'getquoted', None)
+    if getquoted is not None:
+        return ('AsIs', getquoted())
+    return ('bind', type(value).__name__)
+
+
+_table_refs = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+([^\s(),;]+)',
+                         re.IGNORECASE)
+
+
+def table_name(name):
+    # unquoted and without a schema, so the same table always compares equal
+    name = name.strip().strip('"[]`').rsplit('.', 1)[-1]
+    return name.strip('"[]`').lower()
+
+
+def tables_in(sql):
+    return {table_name(name) for name in _table_refs.findall(sql)}
+
+
+def make_fingerprint(parts):
+    # parts hold only strings, tuples and the like, whose repr is the same
+    #   in every process
+    return sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
 def indent_string(s, indent=0, skip_first=False):
     if not indent:
         return s
@@ -79,124 +125,358 @@ def indent_string(s, indent=0, skip_first=False):
     return '\n'.join(' ' * indent + line for line in lines)
 
 
-def compile(chain, query_type):
-    table = None
-    distinct_on = []
-    columns = []
-    from_ = []
-    where = []
-    having = []
-    group_by = []
-    order_by = []
-    top = None
-    limit = None
-    offset = None
-    set_ = []
-    extra = []
-    returning = []
-
+def _add_from(sections, option):
+    # kept as the pieces of the final FROM text, joins going onto the table
+    #   before them
+    expr, join, join_op, criteria = option
+    parts = sections.get(FROM)
+    if parts is None:
+        if join:
+            raise BogusQuery('JOIN needs a FROM before it')
+        parts = sections[FROM] = []
+    if not join:
+        if parts:
+            parts.append(',' + SEP)
+        parts.append(expr)
+    else:
+        parts += ('\n  ', join, ' ', expr)
+        if join_op is not None:
+            parts += (SEP, join_op, ' ', criteria)
+
+
+_APPEND = 'append'
+# only the last one counts
+_REPLACE = 'replace'
+
+_collectors = {DISTINCT_ON: _APPEND,
+               COLUMN: _APPEND,
+               WHERE: _APPEND,
+               FROM: _add_from,
+               TABLE: _REPLACE,
+               SET: _APPEND,
+               GROUP_BY: _APPEND,
+               ORDER_BY: _APPEND,
+               TOP: _REPLACE,
+               LIMIT: _REPLACE,
+               OFFSET: _REPLACE,
+               HAVING: _APPEND,
+               EXTRA: _APPEND,
+               RETURNING: _APPEND}
+
+
+def _collect_into(sections, chain):
+    collectors = _collectors
     for op, option in chain:
-        if op == DISTINCT_ON:
-            distinct_on.append(option)
-        elif op == COLUMN:
-            columns.append(option)
-        elif op == WHERE:
-            where.append(option)
-        elif op == FROM:
-            expr, join, op, criteria = option
-            if not join:
-                if from_:
-                    from_[-1] += ','
-                from_.append(expr)
+        collect = collectors.get(op)
+        if collect is _APPEND:
+            options = sections.get(op)
+            if options is None:
+                sections[op] = [option]
             else:
-                from_[-1] += '\n  ' + join + ' ' + expr
-                if op is not None:
-                    from_[-1] += SEP + op + ' ' + criteria
-        elif op == TABLE:
-            table = option
-        elif op == SET:
-            set_.append(option)
-        elif op == GROUP_BY:
-            group_by.append(option)
-        elif op == ORDER_BY:
-            order_by.append(option)
-        elif op == TOP:
-            top = option
-        elif op == LIMIT:
-            limit = option
-        elif op == OFFSET:
-            offset = option
-        elif op == HAVING:
-            having.append(option)
-        elif op == EXTRA:
-            extra.append(option)
-        elif op == RETURNING:
-            returning.append(option)
-        else:
+                options.append(option)
+        elif collect is _REPLACE:
+            sections[op] = option
+        elif collect is None:
             raise BogusQuery('There was a fatal error compiling query.')
+        else:
+            collect(sections, option)
+    return sections
+
+
+def collect_sections(chain):
+    # {op: options} for the chain, in the order they were added
+    return _collect_into({}, chain)
+
+
+def extend_sections(base, chain):
+    # base's sections with chain added, and the ops chain touched.  Lists
+    #   from base are copied before anything is added to them.
+    sections = dict(base)
+    touched = {op for op, option in chain}
+    for op in touched:
+        options = sections.get(op)
+        if type(options) is list:
+            sections[op] = list(options)
+    return _collect_into(sections, chain), touched
+
+
+def _indented_where(where):
+    # what indent_string(..., 7, True) gives: the lines of multi-line
+    #   conditions lined up under the first
+    return SEP.join(' AND\n'.join(where).splitlines())
+
+
+# (op, prefix, how the options are joined, suffix) for each section in
+#   the order it is written.  None joins a single option, a function
+#   renders them.
+_select_sections = ((TOP, 'TOP ', None, SEP),
+                    (DISTINCT_ON, 'DISTINCT ON (', ', ', ')' + SEP),
+                    (COLUMN, '', COLUMN_SEP, ''),
+                    (FROM, '\n  FROM ', '', ''),
+                    (WHERE, '\n WHERE ', _indented_where, ''),
+                    (GROUP_BY, '\nGROUP BY ', GROUP_BY_SEP, ''),
+                    (HAVING, '\nHAVING ', HAVING_SEP, ''),
+                    (ORDER_BY, '\nORDER BY ', ORDER_BY_SEP, ''),
+                    (LIMIT, '\n LIMIT ', None, ''),
+                    (OFFSET, '\nOFFSET ', None, ''),
+                    (EXTRA, '', '\n', ''))
+
+_update_sections = ((TABLE, '', None, ''),
+                    (SET, '\n   SET ', ',' + SEP, ''),
+                    (FROM, '\n  FROM ', '', ''),
+                    (WHERE, '\n WHERE ', WHERE_SEP, ''),
+                    (EXTRA, '', '\n', ''),
+                    (RETURNING, '\nRETURNING ', ', ', ''))
+
+_delete_sections = ((TABLE, '', None, ''),
+                    (FROM, '\n  FROM ', '', ''),
+                    (WHERE, '\n WHERE ', WHERE_SEP, ''),
+                    (RETURNING, '\nRETURNING ', ', ', ''))
+
+# query type: (head, op the query can't do without, sections)
+_emitters = {SELECT_QT: ('SELECT ', None, _select_sections),
+             UPDATE_QT: ('UPDATE ', TABLE, _update_sections),
+             DELETE_QT: ('DELETE FROM ', TABLE, _delete_sections)}
+
+
+def render_section(options, prefix, joiner, suffix):
+    if joiner is None:
+        return prefix + options + suffix
+    if type(joiner) is str:
+        return prefix + joiner.join(options) + suffix
+    return prefix + joiner(options) + suffix
+
+
+def compile_sections(sections, query_type, fragments):
+    # fragments holds {op: text} for sections already rendered, and is
+    #   given the rest
+    try:
+        head, required, layout = _emitters[query_type]
+    except KeyError:
+        return ';'
+    if required is not None and required not in sections:
+        raise BogusQuery(f'{head.strip()} needs a table')
+
+    parts = [head]
+    for op, prefix, joiner, suffix in layout:
+        text = fragments.get(op)
+        if text is None:
+            # a TOP, LIMIT or OFFSET of None takes out an earlier one
+            options = sections.get(op)
+            if options is None:
+                continue
+            text = fragments[op] = render_section(options,
+                                                  prefix,
+                                                  joiner,
+                                                  suffix)
+        parts.append(text)
+    parts.append(';')
+    return ''.join(parts)
+
+
+def compile(chain, query_type):
+    return compile_sections(collect_sections(chain), query_type, {})
+
+
+_non_word = re.compile(r'\W')
+_pyformat_bind = re.compile(r'%\(([^)]+)\)s|%%')
+
+
+def to_numbered_binds(sql):
+    # rewrites %(name)s binds as $1..$n, returning the new SQL and the bind
+    #   names in position order
+    names = []
+    positions = {}
+
+    def replace(match):
+        name = match.group(1)
+        if name is None:
+            return '%'
+        if name not in positions:
+            names.append(name)
+            positions[name] = len(names)
+        return '$%d' % positions[name]
+
+    numbered = _pyformat_bind.sub(replace, sql)
+    if not names:
+        return sql, names
+    return numbered, names
+
+
+compile_cache = LRUCache(maxsize=2048)
+
+_log_lock = Lock()
+
+
+def _extend_log(log, length, items):
+    # Chains and binds live in append-only lists shared between a node and
+    # its descendants.  A node only ever reads log[:length], so a child can
+    # append in place as long as nobody else has extended the list past its
+    # parent; branching from an older node copies the prefix instead.
+    if not items:
+        return log, length
+    with _log_lock:
+        if type(log) is not list:
+            # the shared empty tuple a new node starts with
+            log = list(log)
+        elif len(log) != length:
+            log = log[:length]
+        log.extend(items)
+    return log, length + len(items)
+
+
+_bind_patterns = {}
+
+
+def bind_pattern(bind_prefix, bind_postfix):
+    key = (bind_prefix, bind_postfix)
+    pattern = _bind_patterns.get(key)
+    if pattern is None:
+        if bind_postfix:
+            name = r'(.+?)'
+        else:
+            name = r'(\w+)'
+        pattern = re.escape(bind_prefix) + name + re.escape(bind_postfix)
+        if '%' in bind_prefix:
+            # an escaped %% is never the start of a bind
+            pattern = '%%|' + pattern
+        pattern = _bind_patterns[key] = re.compile(pattern)
+    return pattern
+
+
+def bind_positions(sql, bind_prefix='%(', bind_postfix=')s'):
+    # (start, end, name) of every bind placeholder in sql, in order
+    return tuple((match.start(), match.end(), match.group(1))
+                 for match in bind_pattern(bind_prefix,
+                                           bind_postfix).finditer(sql)
+                 if match.group(1) is not None)
+
+
+def splice_binds(sql, positions, values):
+    # replaces the placeholders of the binds named in values in one pass,
+    #   leaving every other placeholder alone
+    if not values:
+        return sql
+    parts = []
+    last = 0
+    for start, end, name in positions:
+        try:
+            value = values[name]
+        except KeyError:
+            continue
+        parts.append(sql[last:start])
+        parts.append(value)
+        last = end
+    if not parts:
+        return sql
+    parts.append(sql[last:])
+    return ''.join(parts)
+
+
+def cached_compile(chain,
+                   query_type,
+                   bind_prefix='%(',
+                   bind_postfix=')s',
+                   make_query=None):
+    # returns the SQL along with the positions of its bind placeholders,
+    #   make_query being what compiles it on a miss when given
+    key = (query_type, tuple(chain), bind_prefix, bind_postfix)
+    compiled = compile_cache.get(key)
+    if compiled is None:
+        if make_query is None:
+            query = compile(chain, query_type)
+        else:
+            query = make_query()
+        compiled = (query, bind_positions(query, bind_prefix, bind_postfix))
+        compile_cache.set(key, compiled)
+    return compiled
+
+
+class QueryTemplate(object):
+    # A built query frozen into its SQL, ready to run again with new bind
+    #   values.  Running it only checks the binds: nothing is built,
+    #   compiled or spliced.
+    __slots__ = ('query',
+                 'bind_names',
+                 'defaults',
+                 '_known',
+                 '_required')
+
+    def __init__(self,
+                 query,
+                 bind_prefix='%(',
+                 bind_postfix=')s',
+                 defaults=None):
+        bind_names = []
+        for start, end, name in bind_positions(query,
+                                               bind_prefix,
+                                               bind_postfix):
+            if name not in bind_names:
+                bind_names.append(name)
+        defaults = MappingProxyType(dict(defaults or {}))
+
+        set_slot = super().__setattr__
+        set_slot('query', query)
+        set_slot('bind_names', tuple(bind_names))
+        set_slot('defaults', defaults)
+        set_slot('_known', frozenset(bind_names).union(defaults))
+        set_slot('_required', frozenset(bind_names).difference(defaults))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('QueryTemplate is immutable')
+
+    def binds_for(self, binds):
+        if not self._known.issuperset(binds):
+            unknown = sorted(set(binds) - self._known)
+            raise BogusQuery(f'Unknown binds for this template: {unknown}')
+        if not self._required.issubset(binds):
+            missing = sorted(self._required - set(binds))
+            raise BogusQuery(f'Missing binds for this template: {missing}')
+        if self.defaults:
+            final_binds = self.defaults.copy()
+            final_binds.update(binds)
+            return final_binds
+        return binds
+
+    def execute(self, conn, **binds):
+        return conn.execute(self.query, self.binds_for(binds))
 
-    query = ''
-    if query_type == SELECT_QT:
-        query += 'SELECT '
-        if top is not None:
-            query += 'TOP ' + top + SEP
-        if distinct_on:
-            query += 'DISTINCT ON (' + ', '.join(distinct_on) + ')'
-            query += SEP
-
-        query += COLUMN_SEP.join(columns)
-
-        if from_:
-            query += '\n  FROM ' + SEP.join(from_)
-        if where:
-            query += '\n WHERE ' + indent_string(' AND\n'.join(where), 7, True)
-        if group_by:
-            query += '\nGROUP BY ' + GROUP_BY_SEP.join(group_by)
-        if having:
-            query += '\nHAVING ' + HAVING_SEP.join(having)
-        if order_by:
-            query += '\nORDER BY ' + ORDER_BY_SEP.join(order_by)
-        if limit is not None:
-            query += '\n LIMIT ' + limit
-        if offset is not None:
-            query += '\nOFFSET ' + offset
-        if extra:
-            query += '\n'.join(extra)
-    elif query_type == UPDATE_QT:
-        query += 'UPDATE ' + table
-        if set_:
-            query += '\n   SET ' + (',' + SEP).join(set_)
-        if from_:
-            query += '\n  FROM ' + SEP.join(from_)
-        if where:
-            query += '\n WHERE ' + WHERE_SEP.join(where)
-        if extra:
-            query += '\n'.join(extra)
-        if returning:
-            query += '\nRETURNING ' + ', '.join(returning)
-    elif query_type == DELETE_QT:
-        query += 'DELETE FROM ' + table
-        if from_:
-            query += '\n  FROM ' + SEP.join(from_)
-        if where:
-            query += '\n WHERE ' + WHERE_SEP.join(where)
-        if returning:
-            query += '\nRETURNING ' + ', '.join(returning)
-
-    query += ';'
-    return query
+    def run_query(self, conn, **binds):
+        return conn.run_query(self.query, self.binds_for(binds))
+
+    def run_queryone(self, conn, **binds):
+        return conn.run_queryone(self.query, self.binds_for(binds))
 
 
 class Query:
+    # nodes are built by the thousand, so they have no __dict__ and start
+    #   out sharing one empty tuple for their chain and binds
+    __slots__ = ('parent',
+                 '_chain',
+                 '_chain_len',
+                 '_bind_log',
+                 '_bind_len',
+                 '_query',
+                 '_bind_positions',
+                 '_fingerprint',
+                 '_sections',
+                 '_fragments')
     query_type = None
     bind_prefix = '%('
     bind_postfix = ')s'
+    batchable = True
 
     def __init__(self):
         self.parent = None
-        self.chain = []
-        self._binds = []
+        self._chain = ()
+        self._chain_len = 0
+        self._bind_log = ()
+        self._bind_len = 0
         self._query = None
+        self._bind_positions = ()
+        self._fingerprint = None
+        self._sections = None
+        self._fragments = None
 
     @classmethod
     def clean_bind_name(cls, s):
@@ -210,18 +490,11 @@ class Query:
 
     @property
     def bind_len(self):
-        total = 0
-        if self.parent is not None:
-            total += self.parent.bind_len
-        total += len(self._binds)
-        return total
+        return self._bind_len
 
     @property
     def bind_items(self):
-        if self.parent is not None:
-            yield from self.parent.bind_items
-        if self._binds:
-            yield from self._binds
+        return islice(self._bind_log, self._bind_len)
 
     @property
     def binds(self):
@@ -235,58 +508,161 @@ class Query:
         return operative_binds
 
     def bind(self, **binds):
-        s = self.child()
         final_binds = []
         for name, value in binds.items():
             name = self.clean_bind_name(name)
             final_binds.append((name, value))
-        s._binds = final_binds
-        return s
+        return self.child(binds=final_binds)
 
-    def child(self):
-        s = self.__class__()
+    def child(self, chain=(), binds=()):
+        # skips __init__, every slot is filled in here
+        cls = self.__class__
+        s = cls.__new__(cls)
         s.parent = self
+        s._chain, s._chain_len = _extend_log(
+            self._chain, self._chain_len, chain)
+        s._bind_log, s._bind_len = _extend_log(
+            self._bind_log, self._bind_len, binds)
+        s._query = None
+        s._bind_positions = ()
+        s._fingerprint = None
+        s._sections = None
+        s._fragments = None
         return s
 
+    def _push(self, chain):
+        # only for nodes under construction that have no children yet
+        self._chain, self._chain_len = _extend_log(
+            self._chain, self._chain_len, chain)
+        self._sections = None
+        self._fragments = None
+
     def build_chain(self):
-        if self.parent is not None:
-            chain = self.parent.build_chain()
-        else:
-            chain = []
-        return chain + self.chain
+        return self._chain[:self._chain_len]
 
     @property
     def query(self):
+        return self._render()
+
+    def _section_state(self):
+        # the chain gathered into sections and the sections rendered so
+        #   far, kept so that children only render what they add to
+        if self._sections is None:
+            self._sections = collect_sections(self.build_chain())
+            self._fragments = {}
+        return self._sections, self._fragments
+
+    def _reusable_ancestor(self):
+        # the nearest ancestor worth building on: one that has its sections
+        #   already, or one branched from, whose chain had to be copied
+        node, ancestor = self, self.parent
+        while ancestor is not None:
+            if ancestor._sections is not None:
+                return ancestor
+            if (type(ancestor._chain) is list and
+                    ancestor._chain is not node._chain):
+                return ancestor
+            node, ancestor = ancestor, ancestor.parent
+        return None
+
+    def _compile_sections(self):
+        ancestor = self._reusable_ancestor()
+        if ancestor is None:
+            sections, fragments = self._section_state()
+            return compile_sections(sections, self.query_type, fragments)
+
+        base, base_fragments = ancestor._section_state()
+        if ancestor._chain_len == self._chain_len:
+            # only binds were added
+            self._sections, self._fragments = base, base_fragments
+            return compile_sections(base, self.query_type, base_fragments)
+
+        sections, touched = extend_sections(
+            base, self._chain[ancestor._chain_len:self._chain_len])
+        fragments = {op: text for op, text in base_fragments.items()
+                     if op not in touched}
+        self._sections, self._fragments = sections, fragments
+        query = compile_sections(sections, self.query_type, fragments)
+        # the sections rendered for the ancestor are kept there as well
+        for op, text in fragments.items():
+            if op not in touched and op not in base_fragments:
+                base_fragments[op] = text
+        return query
+
+    @property
+    def table_names(self):
+        # every table named in the chain, including ones in subqueries
+        tables = set()
+        for op, option in self.build_chain():
+            if op == TABLE:
+                tables.add(table_name(option.split()[0]))
+                continue
+            if op == FROM:
+                expr = option[0]
+                if not expr.lstrip().startswith('('):
+                    tables.add(table_name(expr.split()[0]))
+                texts = [part for part in option if isinstance(part, str)]
+            elif isinstance(option, str):
+                texts = [option]
+            else:
+                continue
+            for text in texts:
+                tables |= tables_in(text)
+        return frozenset(tables)
+
+    @property
+    def fingerprint(self):
+        # the chain holds bind names, never values, so only AsIs binds that
+        #   end up in the SQL text need adding
+        if self._fingerprint is None:
+            final_binds = dict(self.bind_items)
+            asis = sorted((key, _literal_key(value))
+                          for key, value in final_binds.items()
+                          if NormAsIs.isasis(value))
+            self._fingerprint = make_fingerprint(
+                (_class_key(self), tuple(self.build_chain()), tuple(asis)))
+        return self._fingerprint
+
+    def _render(self, render_value=None):
+        # AsIs binds, and every other bind when render_value is given, are
+        #   spliced into the compiled SQL at their recorded positions
         isasis = NormAsIs.isasis
 
         if self._query is None:
-            self._query = compile(self.build_chain(), self.query_type)
-        query = self._query
-
-        final_binds = {}
+            self._query, self._bind_positions = cached_compile(
+                self.build_chain(),
+                self.query_type,
+                self.bind_prefix,
+                self.bind_postfix,
+                self._compile_sections)
+
+        values = {}
         for key, value in self.bind_items:
-            final_binds[key] = value
-        for key in sorted(final_binds.keys(), key=len, reverse=True):
-            value = final_binds[key]
             if isasis(value):
-                query = query.replace(self.bnd(key), value.value)
-        return query
+                values[key] = value.value
+            elif render_value is None:
+                values.pop(key, None)
+            else:
+                values[key] = render_value(value)
+        return splice_binds(self._query, self._bind_positions, values)
 
     @property
     def _loggable_query(self):
-        query = self.query
-        for key, value in self.binds.items():
-            query = query.replace(self.bnd(key), repr(value))
-        return query
+        return self._render(repr)
 
-    def _merge_subquery(self, subquery, indent=0):
+    def template(self):
+        return QueryTemplate(self.query,
+                             self.bind_prefix,
+                             self.bind_postfix,
+                             self.binds)
+
+    def _merge_subquery(self, subquery, binds, indent=0):
         if isinstance(subquery, str):
             return subquery
 
         try:
             query = subquery.query.rstrip(';')
-            for pair in subquery.bind_items:
-                self._binds.append(pair)
+            binds.extend(subquery.bind_items)
             return indent_string(query, indent)
 
         except AttributeError:
@@ -294,25 +670,49 @@ class Query:
 
 
 class _SELECT_UPDATE(Query):
+    __slots__ = ()
+
     def WHERE(self, *args, **kw):
         # TODO: handle OR
-        s = self.child()
+        chain = []
+        binds = []
         for stmt in args:
-            clause = s._merge_subquery(stmt)
-            s.chain.append((WHERE, clause))
+            clause = self._merge_subquery(stmt, binds)
+            chain.append((WHERE, clause))
         for column_name, value in kw.items():
             bind_val_name = '%s_bind_%s' % (
-                self.clean_bind_name(column_name), s.bind_len)
-            s._binds.append((bind_val_name, value))
+                self.clean_bind_name(column_name),
+                self._bind_len + len(binds))
+            binds.append((bind_val_name, value))
             expr = column_name + ' = ' + self.bnd(bind_val_name)
-            s.chain.append((WHERE, expr))
-        return s
+            chain.append((WHERE, expr))
+        return self.child(chain, binds)
+
+    def WHERE_IN(self, column, values):
+        # column matching any of values, as a single WHERE clause
+        values = list(values)
+        if not values:
+            return self.child([(WHERE, '1 = 0')])
+        # the column can be any expression, so keep only word characters
+        bind_name = '%s_in_%s' % (
+            _non_word.sub('_', self.clean_bind_name(column)),
+            self._bind_len)
+        expr, binds = self._in_clause(column, bind_name, values)
+        return self.child([(WHERE, expr)], binds)
+
+    def _in_clause(self, column, bind_name, values):
+        # a bind per value, which dialects with a cheaper way override
+        binds = [(f'{bind_name}_{ix}', value)
+                 for ix, value in enumerate(values)]
+        return self._in_list(column, binds), binds
+
+    def _in_list(self, column, binds):
+        return (column + ' IN (' +
+                ', '.join(self.bnd(name) for name, value in binds) + ')')
 
     def FROM(self, *args):
-        s = self.child()
-        for stmt in args:
-            s.chain.append((FROM, (stmt, False, None, None)))
-        return s
+        return self.child([(FROM, (stmt, False, None, None))
+                           for stmt in args])
 
     def JOIN(self,
              stmt,
@@ -355,9 +755,7 @@ class _SELECT_UPDATE(Query):
         else:
             raise BogusQuery('No join criteria specified.')
 
-        s = self.child()
-        s.chain.append((FROM, (stmt, keyword, op, criteria)))
-        return s
+        return self.child([(FROM, (stmt, keyword, op, criteria))])
 
     def LEFTJOIN(self, *args, **kw):
         return self.JOIN(*args, join_type=LEFT_JOIN, **kw)
@@ -369,132 +767,129 @@ class _SELECT_UPDATE(Query):
         return self.JOIN(*args, join_type=FULL_JOIN, **kw)
 
     def RETURNING(self, *args):
-        s = self.child()
-        for arg in args:
-            self.chain.append((RETURNING, arg))
-        return s
+        return self.child([(RETURNING, arg) for arg in args])
+
+
+class ArrayInMixin:
+    # for drivers that send a list as an array: one bind whatever its size
+    __slots__ = ()
+
+    def _in_clause(self, column, bind_name, values):
+        return (column + ' = ANY(' + self.bnd(bind_name) + ')',
+                [(bind_name, values)])
 
 
 class SELECT(_SELECT_UPDATE):
+    __slots__ = ()
     query_type = SELECT_QT
 
     def __init__(self, *args):
         _SELECT_UPDATE.__init__(self)
 
+        columns = []
         for stmt in args:
             try:
                 stmt = str(int(stmt))
             except ValueError:
                 pass
 
-            self.chain.append((COLUMN, stmt))
+            columns.append((COLUMN, stmt))
+        self._push(columns)
 
     def SELECT(self, *args):
-        s = self.child()
-        for stmt in args:
-            s.chain.append((COLUMN, stmt))
-        return s
+        return self.child([(COLUMN, stmt) for stmt in args])
 
     def HAVING(self, *args):
-        s = self.child()
-        for arg in args:
-            s.chain.append((HAVING, arg))
-        return s
+        return self.child([(HAVING, arg) for arg in args])
 
     def ORDER_BY(self, *args):
-        s = self.child()
-        for arg in args:
-            s.chain.append((ORDER_BY, arg))
-        return s
+        return self.child([(ORDER_BY, arg) for arg in args])
 
     def GROUP_BY(self, *args):
-        s = self.child()
-        for arg in args:
-            s.chain.append((GROUP_BY, arg))
-        return s
+        return self.child([(GROUP_BY, arg) for arg in args])
 
     def DISTINCT_ON(self, *args):
-        s = self.child()
-        for arg in args:
-            s.chain.append((DISTINCT_ON, arg))
-        return s
+        return self.child([(DISTINCT_ON, arg) for arg in args])
 
     def TOP(self, stmt):
         if isinstance(stmt, int):
             stmt = str(stmt)
-        s = self.child()
-        s.chain.append((TOP, stmt))
-        return s
+        return self.child([(TOP, stmt)])
 
     def LIMIT(self, stmt):
         if isinstance(stmt, int):
             stmt = str(stmt)
-        s = self.child()
-        s.chain.append((LIMIT, stmt))
-        return s
+        return self.child([(LIMIT, stmt)])
 
     def OFFSET(self, stmt):
         if isinstance(stmt, int):
             stmt = str(stmt)
-        s = self.child()
-        s.chain.append((OFFSET, stmt))
-        return s
+        return self.child([(OFFSET, stmt)])
 
 
 class EXISTS(SELECT):
-    @property
-    def query(self):
+    __slots__ = ()
+
+    def _render(self, render_value=None):
         query = 'EXISTS (\n'
-        query += indent_string(super().query.rstrip(';'), 2) + ')'
+        query += indent_string(
+            super()._render(render_value).rstrip(';'), 2) + ')'
         return query
 
 
 class NOT_EXISTS(EXISTS):
-    @property
-    def query(self):
-        return 'NOT ' + super().query
+    __slots__ = ()
+
+    def _render(self, render_value=None):
+        return 'NOT ' + super()._render(render_value)
 
 
 class UPDATE(_SELECT_UPDATE):
+    __slots__ = ()
     query_type = UPDATE_QT
 
     def __init__(self, table=None):
         super(UPDATE, self).__init__()
 
         if table is not None:
-            self.chain.append((TABLE, table))
+            self._push([(TABLE, table)])
 
     def SET(self, *args, **kw):
-        s = self.child()
-        for stmt in args:
-            self.chain.append((SET, stmt))
-
+        chain = [(SET, stmt) for stmt in args]
+        binds = []
         for column_name, value in kw.items():
             clean_column_name = self.clean_bind_name(column_name)
             bind_name = clean_column_name + '_bind'
-            s._binds.append((bind_name, value))
+            binds.append((bind_name, value))
             expr = str(column_name) + ' = ' + self.bnd(bind_name)
-            s.chain.append((SET, expr))
-        return s
+            chain.append((SET, expr))
+        return self.child(chain, binds)
 
     def EXTRA(self, *args):
         pass
 
 
 class DELETE(_SELECT_UPDATE):
+    __slots__ = ()
     query_type = DELETE_QT
 
     def __init__(self, table=None):
         super(DELETE, self).__init__()
 
         if table is not None:
-            self.chain.append((TABLE, table))
+            self._push([(TABLE, table)])
 
 
 class INSERT:
     bind_prefix = '%('
     bind_postfix = ')s'
+    batchable = True
     defaultdefault = None
+    max_bind_params = None
+    # caps every chunk, so insert_many holds a bounded number of rows even
+    #   where the database sets no limit of its own
+    max_rows = 1000
+    max_query_bytes = None
 
     def __init__(self,
                  table,
@@ -503,7 +898,8 @@ class INSERT:
                  statement=None,
                  default=_default,
                  on_conflict=None,
-                 returning=None):
+                 returning=None,
+                 mode=VALUES_MODE):
         self.table = table
         self.data = data
         self._columns = columns
@@ -515,36 +911,21 @@ class INSERT:
         self.on_conflict = on_conflict
         self.returning = returning
 
+        if mode not in (VALUES_MODE, EXECUTEMANY_MODE):
+            raise BogusQuery(f'Unknown INSERT mode {mode!r}')
+        if mode == EXECUTEMANY_MODE and (statement or data is None):
+            raise BogusQuery('executemany mode requires row data')
+        self.mode = mode
+
     @classmethod
     def bnd(cls, s):
         return "%s%s%s" % (cls.bind_prefix, s, cls.bind_postfix)
 
     @property
     def binds(self):
-        isasis = NormAsIs.isasis
-        binds = {}
-        if self.statement:
-            binds.update(self.statement.binds)
-        if self.data is None:
-            return binds
-
-        if self.multi_data:
-            data = self.data
-        else:
-            data = [self.data]
-
-        for index, d in enumerate(data):
-            for col_name in self.columns:
-                key = f'{col_name}_{index}'
-
-                if col_name in d:
-                    if not isasis(d[col_name]):
-                        binds[key] = d[col_name]
-                else:
-                    if not isasis(self.default):
-                        binds[key] = self.default
-
-        return binds
+        if self.mode == EXECUTEMANY_MODE:
+            return self._executemany_binds()
+        return self._compiled[1]
 
     @cached_property
     def multi_data(self):
@@ -557,6 +938,9 @@ class INSERT:
         if self._columns is None:
             if self.data is None:
                 return None
+            if iter(self.data) is self.data:
+                # finding the columns would consume a generator
+                self.data = list(self.data)
             if not self.multi_data:
                 return list(sorted([key for key in self.data]))
             else:
@@ -568,61 +952,265 @@ class INSERT:
 
     @property
     def query(self):
+        if self.mode == EXECUTEMANY_MODE:
+            return self._template_query
+        return self._compiled[0]
+
+    @property
+    def table_names(self):
+        # only the table written to
+        return frozenset([table_name(self.table.split()[0])])
+
+    @property
+    def fingerprint(self):
+        # the shape of one row, the number of rows and their bound values
+        #   are left out, but AsIs values are part of the SQL text
+        statement = self.statement
+        if statement is not None and not isinstance(statement, str):
+            statement = statement.fingerprint
+        columns = self.columns
+        asis = None
+        if columns is not None:
+            if self.data is not None:
+                rows = self.data if self.multi_data else (self.data,)
+                asis = tuple(self._asis_keys(rows, col_name)
+                             for col_name in columns)
+            columns = tuple(self._bind_param_name(col_name)
+                            for col_name in columns)
+        returning = self.returning
+        if returning is not None and not isinstance(returning, str):
+            returning = tuple(returning)
+        return make_fingerprint((_class_key(self),
+                                 self.table,
+                                 columns,
+                                 asis,
+                                 statement,
+                                 _literal_key(self.default),
+                                 self.on_conflict,
+                                 returning,
+                                 self.mode))
+
+    @staticmethod
+    def _asis_keys(rows, col_name):
+        keys = set()
+        for row in rows:
+            if col_name in row:
+                key = _literal_key(row[col_name])
+                if key[0] == 'AsIs':
+                    keys.add(key)
+        return tuple(sorted(keys, key=repr))
+
+    def template(self):
+        # rows become one VALUES row bound by column name, with a single
+        #   row's values as the defaults
+        if self.statement or self.columns is None:
+            return QueryTemplate(self.query,
+                                 self.bind_prefix,
+                                 self.bind_postfix,
+                                 self.binds)
+
+        defaults = {}
+        asis = {}
+        if not self.multi_data:
+            for col_name, value in self.data.items():
+                if NormAsIs.isasis(value):
+                    asis[col_name] = value.value
+                else:
+                    defaults[col_name] = value
+        query = self._template_query
+        query = splice_binds(query,
+                             bind_positions(query,
+                                            self.bind_prefix,
+                                            self.bind_postfix),
+                             asis)
+        return QueryTemplate(query,
+                             self.bind_prefix,
+                             self.bind_postfix,
+                             defaults)
+
+    @cached_property
+    def _compiled(self):
         if self.multi_data:
-            return self._query(self.data)
+            return self._compile(self.data)
         else:
-            return self._query([self.data])
+            return self._compile([self.data])
 
-    def _bind_param_name(self, col_name, index):
+    def _bind_param_name(self, col_name, index=None):
+        if index is None:
+            return f'{self.bind_prefix}{col_name}{self.bind_postfix}'
         return f'{self.bind_prefix}{col_name}_{index}{self.bind_postfix}'
 
-    def _query(self, data):
+    @cached_property
+    def values_template(self):
+        return '(' + ', '.join(self._bind_param_name(col_name)
+                               for col_name in self.columns) + ')'
+
+    @cached_property
+    def _template_query(self):
+        return self._head + '\n  VALUES\n' + \
+            self.values_template + self._tail
+
+    @property
+    def _head(self):
+        return 'INSERT INTO %s (%s)' % (self.table, ', '.join(self.columns))
+
+    @property
+    def _tail(self):
+        tail = ''
+        if self.on_conflict:
+            tail += f'\nON CONFLICT {self.on_conflict}'
+        if self.returning:
+            if isinstance(self.returning, str):
+                returning = [self.returning]
+            else:
+                returning = self.returning
+            tail += '\nRETURNING ' + ', '.join(returning)
+        return tail + ';'
+
+    def chunks(self, max_params=None, max_rows=None, max_bytes=None):
+        if max_params is None:
+            max_params = self.max_bind_params
+        if max_rows is None:
+            max_rows = self.max_rows
+        if max_bytes is None:
+            max_bytes = self.max_query_bytes
+
+        if (self.statement or self.data is None or
+                self.mode == EXECUTEMANY_MODE):
+            yield self
+            return
+
+        if self.multi_data:
+            data = self.data
+        else:
+            data = [self.data]
+
+        fixed_columns = self._columns
+        chunk = []
+        columns = set(fixed_columns or ())
+        size = 0
+        for d in data:
+            if fixed_columns is None:
+                row_columns = columns.union(d)
+            else:
+                row_columns = columns
+            if max_bytes:
+                row_size = self._estimate_row_size(d)
+            else:
+                row_size = 0
+
+            if chunk and (
+                    (max_rows and len(chunk) >= max_rows) or
+                    (max_params and
+                     len(row_columns) * (len(chunk) + 1) > max_params) or
+                    (max_bytes and size + row_size > max_bytes)):
+                yield self._with_data(chunk, fixed_columns)
+                chunk = []
+                size = 0
+                row_columns = set(fixed_columns or d)
+
+            chunk.append(d)
+            columns = row_columns
+            size += row_size
+
+        if chunk:
+            yield self._with_data(chunk, fixed_columns)
+
+    def _estimate_row_size(self, d):
+        # rough size of a row once rendered, placeholders plus values
+        size = 4
+        for col_name, value in d.items():
+            size += 2 * len(col_name) + len(str(value)) + 12
+        return size
+
+    def _with_data(self, data, columns):
+        i = copy.copy(self)
+        for name in ('multi_data',
+                     'columns',
+                     '_compiled',
+                     'values_template',
+                     '_template_query'):
+            i.__dict__.pop(name, None)
+        i.data = data
+        i._columns = columns
+        return i
+
+    def _executemany_binds(self):
+        isasis = NormAsIs.isasis
+        columns = self.columns
+        default = self.default
+        if self.multi_data:
+            data = self.data
+        else:
+            data = [self.data]
+
+        for d in data:
+            binds = {}
+            for col_name in columns:
+                col_val = d.get(col_name, default)
+                if isasis(col_val):
+                    raise BogusQuery(
+                        'executemany mode can not insert AsIs values, '
+                        f'found {col_val!r} for {col_name}')
+                binds[col_name] = col_val
+            yield binds
+
+    def _compile(self, data):
+        # builds the SQL text and the bind dict together in one pass
         isasis = NormAsIs.isasis
-        q = 'INSERT INTO %s ' % self.table
+        binds = {}
+        parts = ['INSERT INTO %s ' % self.table]
+        append = parts.append
+        columns = self.columns
 
-        if self.columns:
-            q += '('
-            q += ', '.join(col_name for col_name in self.columns)
-            q += ')'
+        if columns:
+            append('(' + ', '.join(columns) + ')')
 
         if self.statement:
-            q += '\n' + indent_string(self.statement.query[:-1], 2)
+            binds.update(self.statement.binds)
+            append('\n' + indent_string(self.statement.query[:-1], 2))
         elif self.data is None:
-            q += 'DEFAULT VALUES'
+            append('DEFAULT VALUES')
         else:
-            q += '\n  VALUES\n'
+            append('\n  VALUES\n')
+            default = self.default
+            bind_param_name = self._bind_param_name
             for index, d in enumerate(data):
-                if index > 0:
-                    q += ',\n'
-
-                q += '('
-                last_col_ix = len(self.columns) - 1
-                for ix, col_name in enumerate(self.columns):
-                    col_val = d.get(col_name, self.default)
+                row = []
+                for col_name in columns:
+                    col_val = d.get(col_name, default)
                     if isasis(col_val):
-                        q += col_val.value
+                        row.append(col_val.value)
                     else:
-                        q += self._bind_param_name(col_name, index)
-                    if last_col_ix != ix:
-                        q += ', '
+                        binds[f'{col_name}_{index}'] = col_val
+                        row.append(bind_param_name(col_name, index))
+                if index > 0:
+                    append(',\n(')
+                else:
+                    append('(')
+                append(', '.join(row))
+                append(')')
 
-                q += ')'
-        if self.on_conflict:
-            q += f'\nON CONFLICT {self.on_conflict}'
+        append(self._tail)
 
-        if self.returning:
-            if isinstance(self.returning, str):
-                returning = [self.returning]
-            else:
-                returning = self.returning
-            q += '\nRETURNING ' + ', '.join(returning)
+        return ''.join(parts), binds
 
-        q += ';'
 
-        return q
+def _render_combined(query, inner, render_value=None):
+    # WITH and UNION are put together from already rendered queries, so the
+    #   placeholders are found in their SQL in the inner query's bind style
+    sql = query.query
+    if render_value is None:
+        return sql
+    positions = bind_positions(sql, inner.bind_prefix, inner.bind_postfix)
+    values = {key: render_value(value)
+              for key, value in query.binds.items()}
+    return splice_binds(sql, positions, values)
 
 
 class WITH(Query):
+    __slots__ = ('tables', 'primary')
+
     def __init__(self, **kw):
         Query.__init__(self)
         self.tables = kw
@@ -653,8 +1241,31 @@ class WITH(Query):
             d.update(self.primary.binds)
         return d
 
+    def _render(self, render_value=None):
+        return _render_combined(self, self.primary, render_value)
+
+    @property
+    def table_names(self):
+        tables = set()
+        for query in self.tables.values():
+            tables |= query.table_names
+        if self.primary is not None:
+            tables |= self.primary.table_names
+        return frozenset(tables)
+
+    @property
+    def fingerprint(self):
+        tables = tuple((name, query.fingerprint)
+                       for name, query in self.tables.items())
+        primary = None
+        if self.primary is not None:
+            primary = self.primary.fingerprint
+        return make_fingerprint((_class_key(self), tables, primary))
+
 
 class UNION(Query):
+    __slots__ = ('op', 'queries')
+
     def __init__(self, *args):
         super().__init__()
 
@@ -678,14 +1289,33 @@ class UNION(Query):
             d.update(query.binds)
         return d
 
+    def _render(self, render_value=None):
+        return _render_combined(self, self.queries[0], render_value)
+
+    @property
+    def table_names(self):
+        return frozenset().union(*(query.table_names
+                                   for query in self.queries))
+
+    @property
+    def fingerprint(self):
+        return make_fingerprint(
+            (_class_key(self),
+             self.op,
+             tuple(query.fingerprint for query in self.queries)))
+
 
 class UNION_ALL(UNION):
+    __slots__ = ()
+
     def __init__(self, *args):
         super().__init__(*args)
         self.op = 'UNION ALL'
 
 
 __all__ = [Query,
+           QueryTemplate,
+           ArrayInMixin,
            SELECT,
            UPDATE,
            DELETE,
@@ -0,0 +1,179 @@
+
+from norm.norm import SELECT
+from norm.norm import INSERT
+from norm.norm import UPDATE
+from norm.norm import DELETE
+from norm.norm import ArrayInMixin
+from norm.norm import EXECUTEMANY_MODE
+from norm.norm import NormAsIs
+from norm.norm import to_numbered_binds
+from norm.async_connection import AsyncConnectionFactory
+from norm.async_connection import AsyncConnectionProxy
+from norm.async_connection import AsyncCursorProxy
+from norm.rows import RowsProxy
+
+
+class ASYNCPG_INSERT(INSERT):
+    defaultdefault = NormAsIs('DEFAULT')
+    # asyncpg sends at most 32767 arguments with a statement
+    max_bind_params = 32767
+
+
+class ASYNCPG_SELECT(ArrayInMixin, SELECT):
+    __slots__ = ()
+
+
+class ASYNCPG_UPDATE(ArrayInMixin, UPDATE):
+    __slots__ = ()
+
+
+class ASYNCPG_DELETE(ArrayInMixin, DELETE):
+    __slots__ = ()
+
+
+def _to_asyncpg(query, params=None):
+    if isinstance(query, str):
+        sql, binds = query, params or {}
+    else:
+        sql, binds = query.query, query.binds
+    sql, names = to_numbered_binds(sql)
+    return sql, [binds[name] for name in names]
+
+
+def _rows_proxy(records):
+    if not records:
+        return RowsProxy([])
+    return RowsProxy([tuple(record) for record in records],
+                     list(records[0].keys()))
+
+
+class ASYNCPG_CursorProxy(AsyncCursorProxy):
+    def __init__(self, conn, connection=None):
+        self.conn = conn
+        self.connection = connection
+        self._rows = RowsProxy([])
+        self._position = 0
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    async def execute(self, query, params=None):
+        sql, args = _to_asyncpg(query, params)
+        records = await self.conn.fetch(sql, *args)
+        self._rows = _rows_proxy(records)
+        self._position = 0
+
+    async def executemany(self, query, seq_of_params=None):
+        await self.connection.executemany(query, seq_of_params)
+
+    async def run_query(self, query, params=None):
+        await self.execute(query, params)
+        return await self.fetchall()
+
+    async def run_queryone(self, query, params=None):
+        await self.execute(query, params)
+        return await self.fetchone()
+
+    async def fetchmany(self, count):
+        start = self._position
+        self._position = min(start + count, len(self._rows.rows))
+        return RowsProxy(self._rows.rows[start:self._position],
+                         self._rows.column_names)
+
+    async def fetchall(self):
+        return await self.fetchmany(len(self._rows.rows))
+
+    async def fetchone(self):
+        rows = list(await self.fetchmany(1))
+        if not rows:
+            return None
+        return rows[0]
+
+    async def close(self):
+        self._rows = RowsProxy([])
+        self._position = 0
+
+
+class ASYNCPG_ConnectionProxy(AsyncConnectionProxy):
+    # asyncpg is natively async, nothing is pushed into threads.  Binds
+    #   produced by Query.bnd are rewritten to asyncpg's $1..$n style.
+    cursor_proxy = ASYNCPG_CursorProxy
+    stream_batch_size = 1000
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def cursor(self):
+        return self.cursor_proxy(self.conn, self)
+
+    async def execute(self, query, params=None):
+        if getattr(query, 'mode', None) == EXECUTEMANY_MODE:
+            return await self.executemany(query)
+        sql, args = _to_asyncpg(query, params)
+        return await self.conn.execute(sql, *args)
+
+    async def executemany(self, query, seq_of_params=None):
+        if isinstance(query, str):
+            sql, seq_of_binds = query, seq_of_params
+        else:
+            sql, seq_of_binds = query.query, query.binds
+        sql, names = to_numbered_binds(sql)
+        return await self.conn.executemany(
+            sql,
+            ([binds[name] for name in names] for binds in seq_of_binds))
+
+    async def insert_many(self, table, rows, **kw):
+        for chunk in ASYNCPG_INSERT(table, rows, **kw).chunks():
+            await self.execute(chunk)
+
+    async def run_query(self, query, params=None):
+        sql, args = _to_asyncpg(query, params)
+        return _rows_proxy(await self.conn.fetch(sql, *args))
+
+    async def run_queryone(self, query, params=None):
+        sql, args = _to_asyncpg(query, params)
+        record = await self.conn.fetchrow(sql, *args)
+        if record is None:
+            return None
+        return dict(record.items())
+
+    async def stream_query(self, query, params=None, batch_size=None):
+        if batch_size is None:
+            batch_size = self.stream_batch_size
+        sql, args = _to_asyncpg(query, params)
+        # asyncpg cursors only exist inside a transaction
+        async with self.conn.transaction():
+            async for record in self.conn.cursor(sql,
+                                                 *args,
+                                                 prefetch=batch_size):
+                yield dict(record.items())
+
+    async def commit(self):
+        raise RuntimeError('asyncpg runs statements in autocommit mode, '
+                           'use conn.transaction() for transactions')
+
+    async def rollback(self):
+        raise RuntimeError('asyncpg runs statements in autocommit mode, '
+                           'use conn.transaction() for transactions')
+
+    async def close(self):
+        await self.conn.close()
+
+
+class ASYNCPG_ConnectionFactory(AsyncConnectionFactory):
+    connection_proxy = ASYNCPG_ConnectionProxy
+
+    def __init__(self, connection_maker):
+        self.connection_maker = connection_maker
+
+    async def __call__(self):
+        return self.connection_proxy(await self.connection_maker())
+
+
+__all__ = [ASYNCPG_INSERT,
+           ASYNCPG_SELECT,
+           ASYNCPG_UPDATE,
+           ASYNCPG_DELETE,
+           ASYNCPG_CursorProxy,
+           ASYNCPG_ConnectionProxy,
+           ASYNCPG_ConnectionFactory]
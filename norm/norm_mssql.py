@@ -1,9 +1,11 @@
+import json
 
 from norm.norm import SELECT
 from norm.norm import INSERT
 from norm.norm import UPDATE
 from norm.norm import DELETE
 from norm.connection import ConnectionFactory
+from norm.connection import PooledConnectionFactory
 from norm.connection import ConnectionProxy
 from norm.connection import CursorProxy
 
@@ -11,19 +13,45 @@ from norm.connection import CursorProxy
 class MSSQL_INSERT(INSERT):
     bind_prefix = ':'
     bind_postfix = ''
-
-
-class MSSQL_SELECT(SELECT):
+    # SQL Server allows at most 2100 parameters and 1000 VALUES rows
+    max_bind_params = 2000
+    max_rows = 1000
+
+
+class MSSQL_InMixin:
+    # SQL Server takes at most 2100 parameters.  An IN list that would not
+    #   fit beside the query's other binds, with room left for clauses
+    #   added after it, is sent as one JSON bind read with OPENJSON
+    #   (SQL Server 2016 and later).
+    __slots__ = ()
+    max_bind_params = 2100
+    in_bind_headroom = 100
+
+    def _in_clause(self, column, bind_name, values):
+        available = (self.max_bind_params -
+                     self._bind_len -
+                     self.in_bind_headroom)
+        if len(values) > available:
+            expr = (column + ' IN (SELECT value FROM OPENJSON(' +
+                    self.bnd(bind_name) + '))')
+            return expr, [(bind_name, json.dumps(values, default=str))]
+        return super()._in_clause(column, bind_name, values)
+
+
+class MSSQL_SELECT(MSSQL_InMixin, SELECT):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
 
-class MSSQL_UPDATE(UPDATE):
+class MSSQL_UPDATE(MSSQL_InMixin, UPDATE):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
 
-class MSSQL_DELETE(DELETE):
+class MSSQL_DELETE(MSSQL_InMixin, DELETE):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
@@ -34,16 +62,24 @@ class MSSQL_CursorProxy(CursorProxy):
 
 class MSSQL_ConnectionProxy(ConnectionProxy):
     cursor_proxy = MSSQL_CursorProxy
+    insert_query = MSSQL_INSERT
+    batch_statements = True
 
 
 class MSSQL_ConnectionFactory(ConnectionFactory):
     connection_proxy = MSSQL_ConnectionProxy
 
 
-__all__ = [MSSQL_INSERT,
+class MSSQL_PooledConnectionFactory(PooledConnectionFactory):
+    connection_proxy = MSSQL_ConnectionProxy
+
+
+__all__ = [MSSQL_InMixin,
+           MSSQL_INSERT,
            MSSQL_SELECT,
            MSSQL_UPDATE,
            MSSQL_DELETE,
            MSSQL_CursorProxy,
            MSSQL_ConnectionProxy,
-           MSSQL_ConnectionFactory]
+           MSSQL_ConnectionFactory,
+           MSSQL_PooledConnectionFactory]
@@ -3,24 +3,26 @@ from .norm import INSERT
 from .norm import UPDATE
 from .norm import DELETE
 from .connection import ConnectionFactory
+from .connection import PooledConnectionFactory
 from .connection import ConnectionProxy
 from .connection import CursorProxy
 
 
 class MY_CON_INSERT(INSERT):
-    pass
+    # MySQL prepared statements take at most 65535 placeholders
+    max_bind_params = 65535
 
 
 class MY_CON_SELECT(SELECT):
-    pass
+    __slots__ = ()
 
 
 class MY_CON_UPDATE(UPDATE):
-    pass
+    __slots__ = ()
 
 
 class MY_CON_DELETE(DELETE):
-    pass
+    __slots__ = ()
 
 
 class MY_CON_CursorProxy(CursorProxy):
@@ -29,16 +31,22 @@ class MY_CON_CursorProxy(CursorProxy):
 
 class MY_CON_ConnectionProxy(ConnectionProxy):
     cursor_proxy = MY_CON_CursorProxy
+    insert_query = MY_CON_INSERT
 
 
 class MY_CON_ConnectionFactory(ConnectionFactory):
     connection_proxy = MY_CON_ConnectionProxy
 
 
+class MY_CON_PooledConnectionFactory(PooledConnectionFactory):
+    connection_proxy = MY_CON_ConnectionProxy
+
+
 __all__ = [MY_CON_INSERT,
            MY_CON_SELECT,
            MY_CON_UPDATE,
            MY_CON_DELETE,
            MY_CON_CursorProxy,
            MY_CON_ConnectionProxy,
-           MY_CON_ConnectionFactory]
+           MY_CON_ConnectionFactory,
+           MY_CON_PooledConnectionFactory]
@@ -1,11 +1,27 @@
+from functools import partial
+from itertools import count
+from time import monotonic
+import io
 
 from psycopg2.extensions import AsIs
+from psycopg2.extras import execute_values
 
+import norm
+from norm import instrumentation
 from .norm import SELECT
 from .norm import INSERT
 from .norm import UPDATE
 from .norm import DELETE
+from .norm import ArrayInMixin
+from .norm import EXECUTEMANY_MODE
+from .norm import BogusQuery
+from .norm import NormAsIs
+from .norm import Query
+from .norm import _default
+from .norm import to_numbered_binds
+from .cache import LRUCache
 from .connection import ConnectionFactory
+from .connection import PooledConnectionFactory
 from .connection import ConnectionProxy
 from .connection import CursorProxy
 
@@ -13,41 +29,343 @@ DEFAULT = AsIs('DEFAULT')
 
 PG_NormAsIs = AsIs
 
+_stream_cursor_ids = count()
+_prepared_ids = count()
+
 
 class PG_INSERT(INSERT):
     defaultdefault = DEFAULT
+    # the most bind parameters the postgres protocol can carry
+    max_bind_params = 65535
+
+
+_copy_escapes = str.maketrans({'\\': '\\\\',
+                               '\t': '\\t',
+                               '\n': '\\n',
+                               '\r': '\\r'})
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (AsIs, NormAsIs)):
+        raise BogusQuery(f'COPY can not send literal SQL {value!r}')
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    return str(value).translate(_copy_escapes)
+
+
+class _CopyReader:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+
+class PG_COPY(PG_INSERT):
+    # COPY can't say DEFAULT per row, missing columns are sent as NULL
+    defaultdefault = None
+    buffer_size = 64 * 1024
+    batchable = False
+
+    def __init__(self,
+                 table,
+                 data,
+                 columns=None,
+                 default=_default,
+                 buffer_size=None):
+        super().__init__(table, data=data, columns=columns, default=default)
+        if buffer_size is not None:
+            self.buffer_size = buffer_size
+
+    @property
+    def query(self):
+        return 'COPY %s (%s) FROM STDIN' % (self.table,
+                                            ', '.join(self.columns))
+
+    @property
+    def binds(self):
+        return {}
 
+    def chunks(self, max_params=None, max_rows=None, max_bytes=None):
+        yield self
 
-class PG_SELECT(SELECT):
-    pass
+    def encoded_chunks(self):
+        columns = self.columns
+        default = self.default
+        buffer_size = self.buffer_size
+        if self.multi_data:
+            data = self.data
+        else:
+            data = [self.data]
 
+        buffer = io.StringIO()
+        write = buffer.write
+        for d in data:
+            write('\t'.join([_copy_value(d.get(col_name, default))
+                             for col_name in columns]))
+            write('\n')
+            if buffer.tell() >= buffer_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
 
-class PG_UPDATE(UPDATE):
-    pass
+    def reader(self):
+        return _CopyReader(self.encoded_chunks())
 
 
-class PG_DELETE(DELETE):
-    pass
+class PG_SELECT(ArrayInMixin, SELECT):
+    __slots__ = ()
+
+
+class PG_UPDATE(ArrayInMixin, UPDATE):
+    __slots__ = ()
+
+
+class PG_DELETE(ArrayInMixin, DELETE):
+    __slots__ = ()
+
+
+class PreparedStatements(LRUCache):
+    # compiled query text -> (statement name, EXECUTE sql, bind names) for
+    #   one connection.  Statements pushed out of the cache are deallocated
+    #   on the server.
+    def __init__(self, conn, maxsize=100):
+        super().__init__(maxsize=maxsize)
+        self.conn = conn
+
+    def prepare(self, cursor, sql_query):
+        statement = self.get(sql_query)
+        if statement is not None:
+            return statement
+
+        numbered, names = to_numbered_binds(sql_query)
+        name = f'norm_prepared_{next(_prepared_ids)}'
+        cursor.execute(f'PREPARE {name} AS {numbered.rstrip().rstrip(";")}')
+        if names:
+            placeholders = ', '.join(['%s'] * len(names))
+            execute_sql = f'EXECUTE {name} ({placeholders})'
+        else:
+            execute_sql = f'EXECUTE {name}'
+        statement = (name, execute_sql, names)
+        self.set(sql_query, statement)
+        return statement
+
+    def evicted(self, sql_query, statement):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(f'DEALLOCATE {statement[0]}')
+        finally:
+            cur.close()
+
+
+def _preparable(query):
+    # literal SQL and IN tuples change the statement text itself, so they
+    #   can't be sent as parameters of a prepared statement
+    if not isinstance(query, Query):
+        return False
+    for value in query.binds.values():
+        if isinstance(value, (AsIs, NormAsIs, tuple)):
+            return False
+    return True
 
 
 class PG_CursorProxy(CursorProxy):
+    # mogrify needs the cursor, so render before it can be closed
+    defer_log_rendering = False
+
+    def __init__(self, cursor, prepared=None):
+        super().__init__(cursor)
+        self.prepared = prepared
+
+    def execute(self, query, params=None):
+        if isinstance(query, PG_COPY):
+            return self.copy(query)
+        if self.prepared is not None and _preparable(query):
+            return self.execute_prepared(query)
+        return super().execute(query, params)
+
+    def execute_prepared(self, query):
+        instrumented = instrumentation.enabled
+        self._event = None
+        compile_start = monotonic()
+        sql_query, sql_binds = query.query, query.binds
+        if instrumented:
+            self._start_event(query, sql_query, sql_binds, compile_start)
+
+        start = monotonic()
+        try:
+            name, execute_sql, names = self.prepared.prepare(self.cursor,
+                                                             sql_query)
+            if names:
+                args = [sql_binds[bind_name] for bind_name in names]
+                res = self.cursor.execute(execute_sql, args)
+            else:
+                res = self.cursor.execute(execute_sql)
+        except Exception as e:
+            if instrumented:
+                self._fail_event(e)
+            raise
+        end = monotonic()
+
+        if instrumented:
+            self._finish_event(end - start)
+
+        if norm.enable_logging:
+            try:
+                self._log_query(end - start, partial(
+                    self._query_to_log, query, sql_query, sql_binds))
+            except Exception:
+                pass
+        return res
+
+    def copy(self, copy):
+        instrumented = instrumentation.enabled
+        self._event = None
+        if instrumented:
+            self._start_event(copy, copy.query, None, monotonic())
+
+        start = monotonic()
+        try:
+            res = self.cursor.copy_expert(copy.query,
+                                          copy.reader(),
+                                          size=copy.buffer_size)
+        except Exception as e:
+            if instrumented:
+                self._fail_event(e)
+            raise
+        end = monotonic()
+
+        if instrumented:
+            self._finish_event(end - start)
+
+        if norm.enable_logging:
+            try:
+                self._log_query(end - start, copy.query)
+            except Exception:
+                pass
+        return res
+
+    def executemany(self, query, seq_of_params=None, page_size=None):
+        if (page_size is None or
+                getattr(query, 'mode', None) != EXECUTEMANY_MODE):
+            return super().executemany(query, seq_of_params)
+
+        # sends page_size rows per statement instead of one per row
+        instrumented = instrumentation.enabled
+        self._event = None
+        if instrumented:
+            compile_start = monotonic()
+        sql_query = query._head + '\n  VALUES %s' + query._tail
+        if instrumented:
+            self._start_event(query, sql_query, None, compile_start)
+
+        start = monotonic()
+        try:
+            res = execute_values(self.cursor,
+                                 sql_query,
+                                 query.binds,
+                                 template=query.values_template,
+                                 page_size=page_size)
+        except Exception as e:
+            if instrumented:
+                self._fail_event(e)
+            raise
+        end = monotonic()
+
+        if instrumented:
+            self._finish_event(end - start)
+        if norm.enable_logging:
+            try:
+                self._log_query(end - start, sql_query)
+            except Exception:
+                pass
+        return res
+
     def _query_to_log(self, query, sql_query, params):
         return self.mogrify(sql_query, params).decode(self.connection.encoding)
 
 
 class PG_ConnectionProxy(ConnectionProxy):
     cursor_proxy = PG_CursorProxy
+    insert_query = PG_INSERT
+    batch_statements = True
+
+    def __init__(self, conn, prepared_statements=0, **kw):
+        super().__init__(conn, **kw)
+        self.prepared = None
+        if prepared_statements:
+            self.prepared = PreparedStatements(conn, prepared_statements)
+
+    def cursor(self, *args, **kw):
+        return self.cursor_proxy(self.conn.cursor(*args, **kw), self.prepared)
+
+    def close(self):
+        # the server drops prepared statements with the session
+        if self.prepared is not None:
+            self.prepared.clear()
+        return super().close()
+
+    def _stream_cursor(self, batch_size):
+        # a named cursor keeps the result set on the server, only
+        #   batch_size rows at a time are sent to us
+        name = f'norm_stream_{next(_stream_cursor_ids)}'
+        cur = self.conn.cursor(name=name, withhold=self.conn.autocommit)
+        cur.itersize = batch_size
+        return self.cursor_proxy(cur)
 
 
 class PG_ConnectionFactory(ConnectionFactory):
     connection_proxy = PG_ConnectionProxy
 
+    def __init__(self, connection_maker, prepared_statements=0, **kw):
+        super().__init__(connection_maker, **kw)
+        self.prepared_statements = prepared_statements
+
+    def _proxy_options(self):
+        options = super()._proxy_options()
+        options['prepared_statements'] = self.prepared_statements
+        return options
+
+
+class PG_PooledConnectionFactory(PooledConnectionFactory):
+    connection_proxy = PG_ConnectionProxy
+
+    def __init__(self, connection_maker, prepared_statements=0, **kw):
+        self.prepared_statements = prepared_statements
+        super().__init__(connection_maker, **kw)
+
+    def _proxy_options(self):
+        options = super()._proxy_options()
+        options['prepared_statements'] = self.prepared_statements
+        return options
+
 
 __all__ = [DEFAULT,
            PG_INSERT,
+           PG_COPY,
            PG_SELECT,
            PG_UPDATE,
            PG_DELETE,
+           PreparedStatements,
            PG_CursorProxy,
            PG_ConnectionProxy,
-           PG_ConnectionFactory]
+           PG_ConnectionFactory,
+           PG_PooledConnectionFactory]
@@ -4,8 +4,11 @@ from norm.norm import INSERT
 from norm.norm import UPDATE
 from norm.norm import DELETE
 from norm.norm import _default
+from norm.norm import VALUES_MODE
 from norm.norm import NormAsIs
+from norm.norm_mssql import MSSQL_InMixin
 from norm.connection import ConnectionFactory
+from norm.connection import PooledConnectionFactory
 from norm.connection import ConnectionProxy
 from norm.connection import CursorProxy
 
@@ -17,21 +20,27 @@ _encrypt_statement = (
     "EncryptByKey(Key_GUID('{key_name}'), CAST({bind} AS VARCHAR(4000)))")
 
 
+def _quote_data(value):
+    from _mssql import quote_data
+    quoted_data = quote_data(value)
+    if isinstance(quoted_data, bytes):
+        quoted_data = quoted_data.decode('utf-8')
+    return quoted_data
+
+
 class PymssqlLoggingMixin:
+    __slots__ = ()
+
     @property
     def _loggable_query(self):
-        from _mssql import quote_data
-        query = self.query
-        for key, value in self.binds.items():
-            quoted_data = quote_data(value)
-            if isinstance(quoted_data, bytes):
-                quoted_data = quoted_data.decode('utf-8')
-            query = query.replace(self.bnd(key), quoted_data)
-        return query
+        return self._render(_quote_data)
 
 
 class PYMSSQL_INSERT(INSERT):
     defaultdefault = PYMSSQL_DEFAULT
+    # SQL Server allows at most 2100 parameters and 1000 VALUES rows
+    max_bind_params = 2000
+    max_rows = 1000
 
     def __init__(self,
                  table,
@@ -42,14 +51,16 @@ class PYMSSQL_INSERT(INSERT):
                  on_conflict=None,
                  returning=None,
                  encrypted_columns=None,
-                 encryption_key=None):
+                 encryption_key=None,
+                 mode=VALUES_MODE):
         super().__init__(table,
                          data=data,
                          columns=columns,
                          statement=statement,
                          default=default,
                          on_conflict=on_conflict,
-                         returning=returning)
+                         returning=returning,
+                         mode=mode)
 
         if encrypted_columns is None:
             self.encrypted_columns = set()
@@ -61,24 +72,24 @@ class PYMSSQL_INSERT(INSERT):
             raise RuntimeError('You must supply an encryption key name when'
                                ' using encrypted columns')
 
-    def _bind_param_name(self, col_name, index):
-        bind = f'{self.bind_prefix}{col_name}_{index}{self.bind_postfix}'
+    def _bind_param_name(self, col_name, index=None):
+        bind = super()._bind_param_name(col_name, index)
         if col_name in self.encrypted_columns:
             return _encrypt_statement.format(key_name=self.encryption_key,
                                              bind=bind)
         return bind
 
 
-class PYMSSQL_SELECT(PymssqlLoggingMixin, SELECT):
-    pass
+class PYMSSQL_SELECT(PymssqlLoggingMixin, MSSQL_InMixin, SELECT):
+    __slots__ = ()
 
 
-class PYMSSQL_UPDATE(PymssqlLoggingMixin, UPDATE):
-    pass
+class PYMSSQL_UPDATE(PymssqlLoggingMixin, MSSQL_InMixin, UPDATE):
+    __slots__ = ()
 
 
-class PYMSSQL_DELETE(PymssqlLoggingMixin, DELETE):
-    pass
+class PYMSSQL_DELETE(PymssqlLoggingMixin, MSSQL_InMixin, DELETE):
+    __slots__ = ()
 
 
 class PYMSSQL_CursorProxy(CursorProxy):
@@ -87,16 +98,23 @@ class PYMSSQL_CursorProxy(CursorProxy):
 
 class PYMSSQL_ConnectionProxy(ConnectionProxy):
     cursor_proxy = PYMSSQL_CursorProxy
+    insert_query = PYMSSQL_INSERT
+    batch_statements = True
 
 
 class PYMSSQL_ConnectionFactory(ConnectionFactory):
     connection_proxy = PYMSSQL_ConnectionProxy
 
 
+class PYMSSQL_PooledConnectionFactory(PooledConnectionFactory):
+    connection_proxy = PYMSSQL_ConnectionProxy
+
+
 __all__ = [PYMSSQL_INSERT,
            PYMSSQL_SELECT,
            PYMSSQL_UPDATE,
            PYMSSQL_DELETE,
            PYMSSQL_CursorProxy,
            PYMSSQL_ConnectionProxy,
-           PYMSSQL_ConnectionFactory]
+           PYMSSQL_ConnectionFactory,
+           PYMSSQL_PooledConnectionFactory]
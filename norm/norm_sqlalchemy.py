@@ -4,6 +4,7 @@ from norm.norm import INSERT
 from norm.norm import UPDATE
 from norm.norm import DELETE
 from norm.connection import ConnectionFactory
+from norm.connection import PooledConnectionFactory
 from norm.connection import ConnectionProxy
 from norm.connection import CursorProxy
 
@@ -14,16 +15,19 @@ class SQLA_INSERT(INSERT):
 
 
 class SQLA_SELECT(SELECT):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
 
 class SQLA_UPDATE(UPDATE):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
 
 class SQLA_DELETE(DELETE):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
@@ -34,16 +38,22 @@ class SQLA_CursorProxy(CursorProxy):
 
 class SQLA_ConnectionProxy(ConnectionProxy):
     cursor_proxy = SQLA_CursorProxy
+    insert_query = SQLA_INSERT
 
 
 class SQLA_ConnectionFactory(ConnectionFactory):
     connection_proxy = SQLA_ConnectionProxy
 
 
+class SQLA_PooledConnectionFactory(PooledConnectionFactory):
+    connection_proxy = SQLA_ConnectionProxy
+
+
 __all__ = [SQLA_INSERT,
            SQLA_SELECT,
            SQLA_UPDATE,
            SQLA_DELETE,
            SQLA_CursorProxy,
            SQLA_ConnectionProxy,
-           SQLA_ConnectionFactory]
+           SQLA_ConnectionFactory,
+           SQLA_PooledConnectionFactory]
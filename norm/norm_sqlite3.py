@@ -1,9 +1,11 @@
+import json
 
 from norm.norm import SELECT
 from norm.norm import INSERT
 from norm.norm import UPDATE
 from norm.norm import DELETE
 from norm.connection import ConnectionFactory
+from norm.connection import PooledConnectionFactory
 from norm.connection import ConnectionProxy
 from norm.connection import CursorProxy
 
@@ -11,19 +13,36 @@ from norm.connection import CursorProxy
 class SQLI_INSERT(INSERT):
     bind_prefix = ':'
     bind_postfix = ''
+    # SQLite 3.32+ accepts up to 32766 parameters, but looking up named
+    #   parameters while parsing is linear, so statements that large get
+    #   quadratically slower.  999 works everywhere and stays fast.
+    max_bind_params = 999
 
 
-class SQLI_SELECT(SELECT):
+class SQLI_InMixin:
+    # the values go in one JSON bind, read back with json_each
+    __slots__ = ()
+
+    def _in_clause(self, column, bind_name, values):
+        expr = (column + ' IN (SELECT value FROM json_each(' +
+                self.bnd(bind_name) + '))')
+        return expr, [(bind_name, json.dumps(values, default=str))]
+
+
+class SQLI_SELECT(SQLI_InMixin, SELECT):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
 
-class SQLI_UPDATE(UPDATE):
+class SQLI_UPDATE(SQLI_InMixin, UPDATE):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
 
-class SQLI_DELETE(DELETE):
+class SQLI_DELETE(SQLI_InMixin, DELETE):
+    __slots__ = ()
     bind_prefix = ':'
     bind_postfix = ''
 
@@ -34,16 +53,23 @@ class SQLI_CursorProxy(CursorProxy):
 
 class SQLI_ConnectionProxy(ConnectionProxy):
     cursor_proxy = SQLI_CursorProxy
+    insert_query = SQLI_INSERT
 
 
 class SQLI_ConnectionFactory(ConnectionFactory):
     connection_proxy = SQLI_ConnectionProxy
 
 
-__all__ = [SQLI_INSERT,
+class SQLI_PooledConnectionFactory(PooledConnectionFactory):
+    connection_proxy = SQLI_ConnectionProxy
+
+
+__all__ = [SQLI_InMixin,
+           SQLI_INSERT,
            SQLI_SELECT,
            SQLI_UPDATE,
            SQLI_DELETE,
            SQLI_CursorProxy,
            SQLI_ConnectionProxy,
-           SQLI_ConnectionFactory]
+           SQLI_ConnectionFactory,
+           SQLI_PooledConnectionFactory]
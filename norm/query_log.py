@@ -0,0 +1,113 @@
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from queue import SimpleQueue
+from random import random
+from threading import Lock
+import atexit
+import logging
+import sys
+
+import norm
+
+logger = logging.getLogger('norm.queries')
+
+_listener = None
+_listener_lock = Lock()
+
+
+class LazyQuery(object):
+    # Renders the query text only when a handler formats the record, which
+    #   with the queue handler happens on the listener thread.
+    __slots__ = ('render', '_text')
+
+    def __init__(self, render):
+        self.render = render
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            text = self.render
+            if callable(text):
+                text = text()
+            self._text = text[:norm.max_query_log_length]
+        return self._text
+
+
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # the stock handler formats the message before queueing it, which
+        #   would render every query on the thread that ran it
+        return record
+
+
+def start_listener(*handlers):
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+        if not handlers:
+            stream_handler = logging.StreamHandler(sys.stderr)
+            stream_handler.setFormatter(logging.Formatter('%(message)s'))
+            handlers = (stream_handler,)
+
+        queue = SimpleQueue()
+        logger.addHandler(DeferredQueueHandler(queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _listener = QueueListener(queue, *handlers,
+                                  respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def stop_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in list(logger.handlers):
+            if isinstance(handler, DeferredQueueHandler):
+                logger.removeHandler(handler)
+        logger.propagate = True
+        _listener = None
+
+
+atexit.register(stop_listener)
+
+
+def _ensure_handler():
+    # no handler anywhere: send norm.queries to stderr off-thread.
+    #   Otherwise records propagate to the app's handlers as usual, and
+    #   only need norm.queries itself to let INFO through.
+    if _listener is None and not logger.hasHandlers():
+        start_listener()
+    elif logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+
+
+def wants(duration):
+    if duration * 1000 < norm.slow_query_ms:
+        return False
+    sample_rate = norm.log_sample_rate
+    if sample_rate < 1 and random() >= sample_rate:
+        return False
+    _ensure_handler()
+    return logger.isEnabledFor(logging.INFO)
+
+
+def log_query(duration, render):
+    logger.info('\nQuery took %.2f seconds:\n%s\n',
+                duration,
+                LazyQuery(render))
+
+
+def log_connect(duration, connection_maker):
+    _ensure_handler()
+    logger.info('\nConnecting to db with %s took %.2f seconds',
+                connection_maker,
+                duration)
+
+
+__all__ = [LazyQuery,
+           DeferredQueueHandler]
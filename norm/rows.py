@@ -1,10 +1,136 @@
+from array import array
+from collections.abc import Mapping
+from datetime import date
+from datetime import datetime
 from itertools import groupby
+from operator import itemgetter
+
+_numpy_dtypes = {bool: '?',
+                 int: 'i8',
+                 float: 'f8',
+                 datetime: 'datetime64[us]',
+                 date: 'datetime64[D]'}
+
+
+def _numpy_dtype(values, type_code=None):
+    if isinstance(type_code, type):
+        types = {type_code}
+        if any(value is None for value in values):
+            types.add(type(None))
+    else:
+        types = set(map(type, values))
+    nullable = type(None) in types
+    types.discard(type(None))
+
+    if len(types) == 2 and types <= {int, float}:
+        return 'f8'
+    if len(types) != 1:
+        return 'O'
+    dtype = _numpy_dtypes.get(types.pop(), 'O')
+    if nullable:
+        if dtype == 'i8':
+            return 'f8'
+        if dtype == '?':
+            return 'O'
+    return dtype
+
+
+class Row(Mapping):
+    # A read-only mapping over one driver row.  Rows from the same result
+    #   share a subclass holding the column name -> index lookup.
+    __slots__ = ('_values',)
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    @classmethod
+    def for_columns(cls, column_names):
+        index = {name: ix for ix, name in enumerate(column_names)}
+        return type(cls.__name__, (cls,), {'__slots__': (), '_index': index})
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def get(self, key, default=None):
+        ix = self._index.get(key)
+        if ix is None:
+            return default
+        return self._values[ix]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f'Row({dict(self)!r})'
+
+
+_sorted = sorted
+
+
+def _null_last_key(key_length):
+    # sorts group keys with NULL after every other value, so NULL never
+    #   has to be compared with anything else
+    if key_length == 1:
+        return lambda item: (item[0] is None, item[0])
+    return lambda item: tuple((value is None, value) for value in item[0])
+
+
+class GroupIndex(Mapping):
+    def __init__(self, rows_proxy, positions):
+        self.rows_proxy = rows_proxy
+        self.positions = positions
+
+    def __getitem__(self, key):
+        rows = self.rows_proxy.rows
+        return RowsProxy([rows[ix] for ix in self.positions[key]],
+                         self.rows_proxy.column_names,
+                         self.rows_proxy.description)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class RowIndex(Mapping):
+    def __init__(self, rows_proxy, positions):
+        self.rows_proxy = rows_proxy
+        self.positions = positions
+
+    def __getitem__(self, key):
+        row = self.rows_proxy.rows[self.positions[key]]
+        column_names = self.rows_proxy.column_names
+        if column_names is None or hasattr(row, 'get'):
+            return row
+        return dict(zip(column_names, row))
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
 
 
 class RowsProxy(object):
-    def __init__(self, rows, column_names=None):
+    def __init__(self, rows, column_names=None, description=None):
         self.rows = rows
         self.column_names = column_names
+        self.description = description
+        self._indexes = {}
 
     def __len__(self):
         return len(self.rows)
@@ -29,5 +155,116 @@ class RowsProxy(object):
             else:
                 yield dict(zip(column_names, row))
 
+    def _key_func(self, cols):
+        column_names = self.column_names
+        if column_names is None:
+            if len(cols) == 1:
+                col = cols[0]
+                return lambda row: row.get(col)
+            return lambda row: tuple(row.get(col) for col in cols)
+        return itemgetter(*[list(column_names).index(col) for col in cols])
+
+    def _positions(self, cols):
+        if not isinstance(self.rows, list):
+            self.rows = list(self.rows)
+        key_func = self._key_func(cols)
+        positions = {}
+        for ix, row in enumerate(self.rows):
+            key = key_func(row)
+            try:
+                positions[key].append(ix)
+            except KeyError:
+                positions[key] = [ix]
+        return positions
+
+    def group_by(self, *cols, sorted=False):
+        index_key = ('group_by', cols, sorted)
+        try:
+            return self._indexes[index_key]
+        except KeyError:
+            pass
+
+        positions = self._positions(cols)
+        if sorted:
+            positions = dict(_sorted(positions.items(),
+                                     key=_null_last_key(len(cols))))
+        index = self._indexes[index_key] = GroupIndex(self, positions)
+        return index
+
+    def index_by(self, col):
+        index_key = ('index_by', col)
+        try:
+            return self._indexes[index_key]
+        except KeyError:
+            pass
+
+        # when a value repeats, the last row with it wins
+        positions = {key: ixs[-1]
+                     for key, ixs in self._positions((col,)).items()}
+        index = self._indexes[index_key] = RowIndex(self, positions)
+        return index
+
+    def records(self):
+        column_names = self.column_names
+        if column_names is None:
+            yield from self.rows
+            return
+
+        row_type = Row.for_columns(column_names)
+        for row in self.rows:
+            if hasattr(row, 'get'):
+                yield row
+            else:
+                yield row_type(row)
+
+    def columns(self, typecodes=None):
+        columns = self.to_columns()
+        if typecodes:
+            for name, typecode in typecodes.items():
+                columns[name] = array(typecode, columns[name])
+        return columns
+
+    def to_columns(self):
+        column_names = self.column_names
+        rows = self.rows
+        if column_names is None:
+            rows = list(rows)
+            if not rows:
+                return {}
+            column_names = list(rows[0])
+            columns = {name: [row.get(name) for row in rows]
+                       for name in column_names}
+        elif rows:
+            columns = {name: list(values)
+                       for name, values in zip(column_names, zip(*rows))}
+        else:
+            columns = {name: [] for name in column_names}
+        return columns
+
+    def to_numpy(self, dtypes=None):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('RowsProxy.to_numpy needs numpy, '
+                              'install norm with the numpy extra')
+
+        columns = self.to_columns()
+        description = self.description
+        dtype = []
+        for ix, (name, values) in enumerate(columns.items()):
+            if dtypes and name in dtypes:
+                dtype.append((name, dtypes[name]))
+                continue
+            type_code = None
+            if description is not None:
+                type_code = description[ix][1]
+            dtype.append((name, _numpy_dtype(values, type_code)))
+
+        length = len(next(iter(columns.values()), ()))
+        result = numpy.empty(length, dtype=dtype)
+        for name, values in columns.items():
+            result[name] = values
+        return result
+
 
-__all__ = [RowsProxy]
+__all__ = [Row, GroupIndex, RowIndex, RowsProxy]
@@ -0,0 +1,288 @@
+import asyncio
+import sqlite3
+
+from pytest import raises
+
+from norm.async_connection import AsyncConnectionFactory
+from norm.norm import EXECUTEMANY_MODE
+from norm.norm_asyncpg import ASYNCPG_ConnectionFactory
+from norm.norm_asyncpg import ASYNCPG_INSERT
+from norm.norm_asyncpg import ASYNCPG_SELECT
+from norm.norm_asyncpg import ASYNCPG_UPDATE
+from norm.norm_asyncpg import _to_asyncpg
+from norm.norm_sqlite3 import SQLI_ConnectionFactory
+from norm.norm_sqlite3 import SQLI_INSERT as INSERT
+from norm.norm_sqlite3 import SQLI_SELECT as SELECT
+
+
+def conn_maker():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        '''CREATE TABLE users (
+               user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+               first_name VARCHAR(64)
+        )''')
+    conn.commit()
+    return conn
+
+
+async_factory = AsyncConnectionFactory(SQLI_ConnectionFactory(conn_maker))
+
+
+def test_async_run_query():
+    async def work():
+        conn = await async_factory()
+        try:
+            await conn.execute(INSERT('users', [{'first_name': 'Justin'},
+                                                {'first_name': 'Bob'}]))
+            await conn.commit()
+
+            s = SELECT('first_name').FROM('users').ORDER_BY('user_id')
+            rows = await conn.run_query(s)
+            row = await conn.run_queryone(s.WHERE(first_name='Bob'))
+            streamed = [row async for row in conn.stream_query(s)]
+            return list(rows), row, streamed
+        finally:
+            await conn.close()
+
+    rows, row, streamed = asyncio.run(work())
+    assert rows == [{'first_name': 'Justin'}, {'first_name': 'Bob'}]
+    assert row == {'first_name': 'Bob'}
+    assert streamed == rows
+
+
+def test_async_cursor_iteration():
+    async def work():
+        conn = await async_factory()
+        await conn.insert_many('users',
+                               ({'first_name': str(n)} for n in range(25)))
+        cur = await conn.cursor()
+        cur.iter_batch_size = 10
+        await cur.execute('SELECT first_name FROM users ORDER BY user_id')
+        names = [row['first_name'] async for row in cur]
+        await cur.close()
+        await conn.close()
+        return names
+
+    assert asyncio.run(work()) == [str(n) for n in range(25)]
+
+
+def test_async_stream_query_uses_stream_cursor():
+    async def work():
+        conn = await async_factory()
+        batch_sizes = []
+        stream_cursor = conn.conn._stream_cursor
+
+        def recording_stream_cursor(batch_size):
+            batch_sizes.append(batch_size)
+            return stream_cursor(batch_size)
+
+        conn.conn._stream_cursor = recording_stream_cursor
+        try:
+            await conn.insert_many('users', ({'first_name': str(n)}
+                                             for n in range(25)))
+            names = [row['first_name'] async for row in conn.stream_query(
+                'SELECT first_name FROM users ORDER BY user_id',
+                batch_size=10)]
+        finally:
+            await conn.close()
+        return names, batch_sizes
+
+    names, batch_sizes = asyncio.run(work())
+    assert names == [str(n) for n in range(25)]
+    assert batch_sizes == [10]
+
+
+def test_async_connections_run_concurrently():
+    async def lookup(n):
+        conn = await async_factory()
+        try:
+            return await conn.run_queryone(f'SELECT {n} AS n')
+        finally:
+            await conn.close()
+
+    async def work():
+        return await asyncio.gather(*[lookup(n) for n in range(5)])
+
+    assert asyncio.run(work()) == [{'n': n} for n in range(5)]
+
+
+def test_asyncpg_numbered_binds():
+    s = (ASYNCPG_SELECT('name')
+         .FROM('users')
+         .WHERE(user_id=5)
+         .WHERE("name LIKE 'b%%' OR nickname = %(name)s")
+         .WHERE('alias = %(name)s')
+         .bind(name='bob'))
+
+    sql, args = _to_asyncpg(s)
+    assert sql == ('SELECT name\n'
+                   '  FROM users\n'
+                   ' WHERE user_id = $1 AND\n'
+                   "       name LIKE 'b%' OR nickname = $2 AND\n"
+                   '       alias = $2;')
+    assert args == [5, 'bob']
+
+    assert _to_asyncpg('SELECT 1') == ('SELECT 1', [])
+
+
+def test_asyncpg_insert_limits():
+    rows = [{f'c{col}': n for col in range(40)} for n in range(1000)]
+    chunks = list(ASYNCPG_INSERT('t', rows).chunks())
+    assert len(chunks) == 2
+    assert all(len(chunk.binds) <= 32767 for chunk in chunks)
+
+    i = ASYNCPG_INSERT('t', [{'a': 1}, {'b': 2}])
+    assert i.query == ('INSERT INTO t (a, b)\n'
+                       '  VALUES\n'
+                       '(%(a_0)s, DEFAULT),\n'
+                       '(DEFAULT, %(b_1)s);')
+
+
+class FakeRecord(object):
+    # the parts of asyncpg.Record norm uses
+    def __init__(self, **values):
+        self._values = values
+
+    def __iter__(self):
+        return iter(self._values.values())
+
+    def keys(self):
+        return self._values.keys()
+
+    def items(self):
+        return self._values.items()
+
+
+class FakeTransaction(object):
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        self.log.append(('BEGIN',))
+
+    async def __aexit__(self, *exc_info):
+        self.log.append(('COMMIT',))
+
+
+class FakeAsyncpgConnection(object):
+    def __init__(self, records):
+        self.records = records
+        self.log = []
+        self.closed = False
+
+    async def fetch(self, sql, *args):
+        self.log.append(('fetch', sql, args))
+        return self.records
+
+    async def fetchrow(self, sql, *args):
+        self.log.append(('fetchrow', sql, args))
+        return self.records[0] if self.records else None
+
+    async def execute(self, sql, *args):
+        self.log.append(('execute', sql, args))
+        return 'OK'
+
+    async def executemany(self, sql, args):
+        self.log.append(('executemany', sql, list(args)))
+
+    def transaction(self):
+        return FakeTransaction(self.log)
+
+    async def cursor(self, sql, *args, prefetch=None):
+        self.log.append(('cursor', sql, args, prefetch))
+        for record in self.records:
+            yield record
+
+    async def close(self):
+        self.closed = True
+
+
+async def _made(conn):
+    return conn
+
+
+def make_asyncpg_records():
+    return [FakeRecord(user_id=1, name='bob'),
+            FakeRecord(user_id=2, name='joe')]
+
+
+def test_asyncpg_connection_proxy():
+    fake = FakeAsyncpgConnection(make_asyncpg_records())
+    s = ASYNCPG_SELECT('user_id', 'name').FROM('users').WHERE(team_id=3)
+
+    async def work():
+        conn = await ASYNCPG_ConnectionFactory(lambda: _made(fake))()
+        rows = await conn.run_query(s)
+        row = await conn.run_queryone(s)
+        streamed = [row async for row in conn.stream_query(s, batch_size=5)]
+        await conn.execute(ASYNCPG_UPDATE('users')
+                           .SET(name='bob')
+                           .WHERE(user_id=1))
+        await conn.execute(ASYNCPG_INSERT('users',
+                                          [{'name': 'a'}, {'name': 'b'}],
+                                          mode=EXECUTEMANY_MODE))
+        await conn.executemany('UPDATE users SET name = %(name)s',
+                               [{'name': 'c'}])
+        await conn.insert_many('users', ({'name': 'd'} for _ in range(2)))
+        with raises(RuntimeError):
+            await conn.commit()
+        await conn.close()
+        return rows, row, streamed
+
+    rows, row, streamed = asyncio.run(work())
+    assert list(rows) == [{'user_id': 1, 'name': 'bob'},
+                          {'user_id': 2, 'name': 'joe'}]
+    assert row == {'user_id': 1, 'name': 'bob'}
+    assert streamed == list(rows)
+    assert fake.closed
+
+    select_sql = ('SELECT user_id,\n'
+                  '       name\n'
+                  '  FROM users\n'
+                  ' WHERE team_id = $1;')
+    assert fake.log == [
+        ('fetch', select_sql, (3,)),
+        ('fetchrow', select_sql, (3,)),
+        ('BEGIN',),
+        ('cursor', select_sql, (3,), 5),
+        ('COMMIT',),
+        ('execute',
+         'UPDATE users\n   SET name = $1\n WHERE user_id = $2;',
+         ('bob', 1)),
+        ('executemany',
+         'INSERT INTO users (name)\n  VALUES\n($1);',
+         [['a'], ['b']]),
+        ('executemany', 'UPDATE users SET name = $1', [['c']]),
+        ('execute',
+         'INSERT INTO users (name)\n  VALUES\n($1),\n($2);',
+         ('d', 'd'))]
+
+
+def test_asyncpg_cursor_proxy():
+    fake = FakeAsyncpgConnection(make_asyncpg_records())
+
+    async def work():
+        conn = await ASYNCPG_ConnectionFactory(lambda: _made(fake))()
+        cur = await conn.cursor()
+        await cur.execute('SELECT user_id, name FROM users')
+        first = await cur.fetchone()
+        rest = list(await cur.fetchmany(5))
+        done = await cur.fetchone()
+        rows = list(await cur.run_query('SELECT user_id, name FROM users'))
+        row = await cur.run_queryone('SELECT user_id, name FROM users')
+        await cur.executemany('DELETE FROM users WHERE user_id = %(id)s',
+                              [{'id': 1}, {'id': 2}])
+        await cur.close()
+        return first, rest, done, rows, row, list(await cur.fetchall())
+
+    first, rest, done, rows, row, closed = asyncio.run(work())
+    assert first == {'user_id': 1, 'name': 'bob'}
+    assert rest == [{'user_id': 2, 'name': 'joe'}]
+    assert done is None
+    assert rows == [first] + rest
+    assert row == first
+    assert closed == []
+    assert fake.log[-1] == ('executemany',
+                            'DELETE FROM users WHERE user_id = $1',
+                            [[1], [2]])
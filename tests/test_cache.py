@@ -0,0 +1,86 @@
+from norm.cache import LRUCache
+from norm.cache import ResultCache
+from norm.norm import compile_cache
+from norm import SELECT
+
+
+def test_lru_eviction_and_stats():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats == {'hits': 3,
+                           'misses': 1,
+                           'evictions': 1,
+                           'size': 2,
+                           'maxsize': 2}
+
+
+def test_lru_evicted_callback():
+    evicted = []
+
+    class RecordingCache(LRUCache):
+        def evicted(self, key, value):
+            evicted.append((key, value))
+
+    cache = RecordingCache(maxsize=1)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert evicted == [('a', 1)]
+
+
+def test_compile_cache_reuses_query_shape():
+    def build(user_id):
+        return (SELECT('user_id', 'first_name')
+                .FROM('users')
+                .WHERE(user_id=user_id)
+                .WHERE("first_name LIKE 'cache_test%'"))
+
+    compile_cache.clear()
+    compile_cache.reset_stats()
+
+    first = build(1)
+    assert compile_cache.stats['misses'] == 0
+    first_query = first.query
+    assert compile_cache.stats['misses'] == 1
+
+    second = build(2)
+    assert second.query == first_query
+    assert compile_cache.stats['hits'] == 1
+    assert second.binds == {'user_id_bind_0': 2}
+
+
+def test_result_cache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('norm.cache.monotonic', lambda: now[0])
+
+    cache = ResultCache(maxsize=10, ttl=5)
+    cache.set_result('q', ('row',), ['users'])
+    now[0] += 4
+    assert cache.get_result('q') == ('row',)
+    now[0] += 1
+    assert cache.get_result('q') is None
+    assert len(cache) == 0
+    assert cache._keys_by_table == {}
+
+
+def test_result_cache_invalidate():
+    cache = ResultCache(maxsize=2)
+    cache.set_result('a', 1, ['users'])
+    cache.set_result('b', 2, ['users', 'groups'])
+    cache.set_result('c', 3, ['groups'])
+
+    # 'a' was evicted and is no longer indexed
+    assert cache.get_result('a') is None
+    assert cache._keys_by_table == {'users': {'b'}, 'groups': {'b', 'c'}}
+
+    cache.invalidate('users')
+    assert cache.get_result('b') is None
+    assert cache.get_result('c') == 3
+    assert cache._keys_by_table == {'groups': {'c'}}
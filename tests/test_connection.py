@@ -2,9 +2,18 @@ from __future__ import unicode_literals
 
 import sqlite3
 
+from pytest import raises
+
 from norm.norm_sqlite3 import SQLI_ConnectionFactory as ConnectionFactory
 from norm.norm_sqlite3 import SQLI_SELECT as SELECT
 from norm.norm_sqlite3 import SQLI_INSERT as INSERT
+from norm.norm_sqlite3 import SQLI_UPDATE as UPDATE
+from norm.cache import ResultCache
+from norm.connection import ConnectionProxy
+from norm.norm import DELETE as PY_DELETE
+from norm.norm import SELECT as PY_SELECT
+from norm.norm import UPDATE as PY_UPDATE
+from norm.norm import WITH
 
 
 def conn_maker():
@@ -60,3 +69,333 @@ def test_runqueryone():
     s = SELECT('user_id').FROM('users')
     row = conn.run_queryone(s)
     assert row == {'user_id': 1}
+
+
+def test_executemany_insert():
+    cf = ConnectionFactory(conn_maker)
+    conn = cf()
+
+    rows = ({'first_name': name} for name in ('Justin', 'Bob', 'Sue'))
+    i = INSERT('users', rows, columns=['first_name'], mode='executemany')
+    conn.execute(i)
+    conn.commit()
+
+    s = SELECT('first_name').FROM('users').ORDER_BY('user_id')
+    assert list(conn.run_query(s)) == [{'first_name': 'Justin'},
+                                       {'first_name': 'Bob'},
+                                       {'first_name': 'Sue'}]
+
+    conn.executemany('INSERT INTO users (first_name) VALUES (:first_name)',
+                     [{'first_name': 'Ted'}])
+    assert len(conn.run_query(s)) == 4
+
+    # only psycopg2 pages rows, everything else ignores page_size
+    conn.executemany(INSERT('users',
+                            [{'first_name': 'Ann'}],
+                            mode='executemany'),
+                     page_size=1000)
+    assert len(conn.run_query(s)) == 5
+
+
+def test_insert_many():
+    cf = ConnectionFactory(conn_maker)
+    conn = cf()
+
+    rows = ({'first_name': str(n)} for n in range(2000))
+    conn.insert_many('users', rows, max_params=300)
+    conn.commit()
+
+    row = conn.run_queryone('SELECT COUNT(*) AS cnt FROM users')
+    assert row == {'cnt': 2000}
+
+
+def test_stream_query():
+    cf = ConnectionFactory(conn_maker)
+    conn = cf()
+    conn.insert_many('users', ({'first_name': str(n)} for n in range(25)))
+
+    s = SELECT('first_name').FROM('users').ORDER_BY('user_id')
+    rows = list(conn.stream_query(s, batch_size=10))
+    assert len(rows) == 25
+    assert rows[0] == {'first_name': '0'}
+    assert rows[-1] == {'first_name': '24'}
+
+    batches = list(conn.stream_query(s, batch_size=10, batches=True))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert list(batches[-1])[-1] == {'first_name': '24'}
+
+
+def test_reuse_cursor():
+    cf = ConnectionFactory(conn_maker, reuse_cursor=True)
+    conn = cf()
+
+    conn.execute(INSERT('users', [{'first_name': 'Justin'},
+                                  {'first_name': 'Bob'}]))
+    cur = conn._cached_cursor
+    assert cur is not None
+
+    s = SELECT('first_name').FROM('users').ORDER_BY('user_id')
+    assert list(conn.run_query(s)) == [{'first_name': 'Justin'},
+                                       {'first_name': 'Bob'}]
+    assert conn.run_queryone(s.WHERE(user_id=2)) == {'first_name': 'Bob'}
+    assert conn._cached_cursor is cur
+
+    # transaction end drops the cached cursor
+    conn.commit()
+    assert conn._cached_cursor is None
+
+    conn.run_queryone(s)
+    cur = conn._cached_cursor
+    with raises(sqlite3.OperationalError):
+        conn.run_query('SELECT nope FROM users')
+    assert conn._cached_cursor is None
+
+    assert conn.run_queryone(s) == {'first_name': 'Justin'}
+    assert conn._cached_cursor is not cur
+    conn.close()
+    assert conn._cached_cursor is None
+
+
+def test_no_reuse_cursor_by_default():
+    cf = ConnectionFactory(conn_maker)
+    conn = cf()
+    conn.run_queryone('SELECT 1 AS one')
+    assert conn._cached_cursor is None
+
+
+def test_batch_sequential():
+    cf = ConnectionFactory(conn_maker)
+    conn = cf()
+
+    s = SELECT('first_name').FROM('users').ORDER_BY('user_id')
+    with conn.batch() as batch:
+        batch.add(INSERT('users', [{'first_name': 'Justin'},
+                                   {'first_name': 'Bob'}]))
+        batch.add(s)
+        batch.add(UPDATE('users').SET(first_name='Joe').WHERE(user_id=2))
+        batch.add(s.WHERE(user_id=2))
+        batch.add('SELECT COUNT(*) AS n FROM users WHERE user_id > :user_id',
+                  {'user_id': 0})
+
+    inserted, rows, updated, row, count = batch.results
+    assert list(inserted) == []
+    assert list(rows) == [{'first_name': 'Justin'}, {'first_name': 'Bob'}]
+    assert list(updated) == []
+    assert list(row) == [{'first_name': 'Joe'}]
+    assert list(count) == [{'n': 2}]
+
+
+class FakeCursor(object):
+    def __init__(self, log):
+        self.log = log
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+        last_statement = sql.split(';')[-2]
+        if 'SELECT' in last_statement or 'RETURNING' in last_statement:
+            self.description = [('n',)]
+        else:
+            self.description = None
+
+    def fetchall(self):
+        return [(len(self.log),)]
+
+    def fetchone(self):
+        return (len(self.log),)
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+
+class BatchingConnectionProxy(ConnectionProxy):
+    batch_statements = True
+
+
+def test_batch_merges_statements():
+    conn = BatchingConnectionProxy(FakeConnection())
+    log = conn.conn.log
+
+    with conn.batch() as batch:
+        batch.add(PY_UPDATE('users').SET(name='Bob').WHERE(user_id=1))
+        batch.add(PY_DELETE('users').WHERE("name LIKE 'x%'"))
+        batch.add(PY_SELECT('COUNT(*) AS n').FROM('users').WHERE(user_id=1))
+        batch.add(PY_UPDATE('users').SET(name='Joe').RETURNING('user_id'))
+        batch.add(PY_DELETE('users').WHERE(user_id=3))
+
+    assert log == [
+        ('UPDATE users\n'
+         '   SET name = %(b0_name_bind)s\n'
+         ' WHERE user_id = %(b0_user_id_bind_1)s;\n'
+         'DELETE FROM users\n'
+         " WHERE name LIKE 'x%%';\n"
+         'SELECT COUNT(*) AS n\n'
+         '  FROM users\n'
+         ' WHERE user_id = %(b2_user_id_bind_0)s;',
+         {'b0_name_bind': 'Bob',
+          'b0_user_id_bind_1': 1,
+          'b2_user_id_bind_0': 1}),
+        (PY_UPDATE('users').SET(name='Joe').RETURNING('user_id').query,
+         {'name_bind': 'Joe'}),
+        (PY_DELETE('users').WHERE(user_id=3).query,
+         {'user_id_bind_0': 3})]
+
+    assert [list(rows) for rows in batch.results] == [
+        [], [], [{'n': 1}], [{'n': 2}], []]
+
+
+def test_result_cache():
+    cache = ResultCache(maxsize=10)
+    cf = ConnectionFactory(conn_maker, result_cache=cache)
+    conn = cf()
+    conn.execute(INSERT('users', [{'first_name': 'Justin'}]))
+    conn.commit()
+
+    s = SELECT('first_name').FROM('users')
+    assert list(conn.run_query(s)) == [{'first_name': 'Justin'}]
+    assert conn.run_queryone(s.WHERE(first_name='Bob')) is None
+
+    # a write behind the proxy's back isn't seen while cached
+    conn.conn.execute("INSERT INTO users (first_name) VALUES ('Bob')")
+    assert list(conn.run_query(s)) == [{'first_name': 'Justin'}]
+    assert conn.run_queryone(s.WHERE(first_name='Bob')) is None
+    assert cache.hits == 2
+
+    # writes through the proxy invalidate the tables they touch
+    conn.execute(UPDATE('users').SET(first_name='Joe').WHERE(user_id=1))
+    assert list(conn.run_query(s)) == [{'first_name': 'Joe'},
+                                       {'first_name': 'Bob'}]
+    assert conn.run_queryone(s.WHERE(first_name='Bob')) == {
+        'first_name': 'Bob'}
+
+    conn.run_query('DELETE FROM users WHERE user_id = 1')
+    assert list(conn.run_query(s)) == [{'first_name': 'Bob'}]
+
+    conn.conn.execute('DELETE FROM users')
+    conn.invalidate_results('Users')
+    assert list(conn.run_query(s)) == []
+
+
+def test_result_cache_rollback():
+    cache = ResultCache(maxsize=10)
+    conn = ConnectionFactory(conn_maker, result_cache=cache)()
+    s = SELECT('first_name').FROM('users')
+
+    conn.execute(INSERT('users', [{'first_name': 'Justin'}]))
+    assert len(conn.run_query(s)) == 1
+    conn.rollback()
+    assert len(conn.run_query(s)) == 0
+
+
+def test_result_cache_skips_uncommitted_reads(tmp_path):
+    path = str(tmp_path / 'test.db')
+    setup = sqlite3.connect(path)
+    setup.execute('CREATE TABLE t (v VARCHAR(16))')
+    setup.execute("INSERT INTO t (v) VALUES ('old')")
+    setup.commit()
+    setup.close()
+
+    cache = ResultCache(maxsize=10)
+    cf = ConnectionFactory(lambda: sqlite3.connect(path), result_cache=cache)
+    a = cf()
+    b = cf()
+    s = SELECT('v').FROM('t')
+
+    a.execute(UPDATE('t').SET(v='uncommitted'))
+    assert a.run_queryone(s) == {'v': 'uncommitted'}
+    assert b.run_queryone(s) == {'v': 'old'}
+    assert a.run_queryone(s) == {'v': 'uncommitted'}
+    assert cache.hits == 0
+    a.rollback()
+    assert a.run_queryone(s) == {'v': 'old'}
+
+    a.close()
+    b.close()
+
+
+def test_result_cache_opt_out():
+    cache = ResultCache(maxsize=10)
+    conn = ConnectionProxy(FakeConnection(), result_cache=cache)
+    s = PY_SELECT('nextval(%(seq)s) AS n').bind(seq='ids')
+
+    assert conn.run_queryone(s, cache=False) == {'n': 1}
+    assert conn.run_queryone(s, cache=False) == {'n': 2}
+    assert list(conn.run_query(s, cache=False)) == [{'n': 3}]
+    assert cache.hits == 0
+
+
+def test_result_cache_skips_writing_ctes():
+    cache = ResultCache(maxsize=10)
+    conn = ConnectionProxy(FakeConnection(), result_cache=cache)
+    log = conn.conn.log
+
+    def bump():
+        return WITH(x=PY_UPDATE('t').SET('n = n + 1').RETURNING('n'))(
+            PY_SELECT('n').FROM('x'))
+
+    assert list(conn.run_query(bump())) == [{'n': 1}]
+    assert list(conn.run_query(bump())) == [{'n': 2}]
+    assert len(log) == 2
+    assert cache.hits == 0
+    assert conn._written == {'t'}
+
+
+def test_result_cache_skips_unhashable_binds():
+    cache = ResultCache(maxsize=10)
+    conn = ConnectionProxy(FakeConnection(), result_cache=cache)
+    s = PY_SELECT('n').FROM('t').WHERE('id = ANY(%(ids)s)').bind(ids=[1, 2])
+
+    assert list(conn.run_query(s)) == [{'n': 1}]
+    assert conn.run_queryone(s) == {'n': 2}
+    assert cache.hits == 0
+
+
+def test_template():
+    conn = ConnectionFactory(conn_maker)()
+    insert = INSERT('users', {'first_name': 'Justin'}).template()
+    insert.execute(conn)
+    insert.execute(conn, first_name='Bob')
+
+    lookup = (SELECT('user_id', 'first_name')
+              .FROM('users')
+              .WHERE('first_name = :first_name')
+              .template())
+    assert lookup.bind_names == ('first_name',)
+    assert lookup.run_queryone(conn, first_name='Bob') == {
+        'user_id': 2, 'first_name': 'Bob'}
+    assert list(lookup.run_query(conn, first_name='Justin')) == [
+        {'user_id': 1, 'first_name': 'Justin'}]
+    assert lookup.run_queryone(conn, first_name='Joe') is None
+
+
+def test_where_in_json_each():
+    conn = ConnectionFactory(conn_maker)()
+    conn.execute(INSERT('users', [{'first_name': f'user {ix}'}
+                                  for ix in range(1, 21)]))
+
+    s = SELECT('user_id').FROM('users').WHERE_IN('user_id',
+                                                 range(0, 10000, 3))
+    assert s.query.count(':') == 1
+    assert [row['user_id'] for row in conn.run_query(s)] == [
+        3, 6, 9, 12, 15, 18]
+
+    s = (SELECT('user_id')
+         .FROM('users')
+         .WHERE_IN('first_name', ['user 2', 'user 4', 'nobody']))
+    assert [row['user_id'] for row in conn.run_query(s)] == [2, 4]
+
+    s = (SELECT('user_id')
+         .FROM('users')
+         .WHERE_IN('upper(first_name)', ['USER 3', 'NOBODY']))
+    assert [row['user_id'] for row in conn.run_query(s)] == [3]
+
+    s = SELECT('user_id').FROM('users').WHERE_IN('user_id', [])
+    assert list(conn.run_query(s)) == []
@@ -0,0 +1,129 @@
+import sqlite3
+
+from pytest import fixture
+from pytest import raises
+
+from norm import instrumentation
+from norm.instrumentation import AFTER_EXECUTE
+from norm.instrumentation import AFTER_FETCH
+from norm.instrumentation import BEFORE_EXECUTE
+from norm.instrumentation import ON_CONNECT
+from norm.instrumentation import ON_ERROR
+from norm.instrumentation import Histogram
+from norm.instrumentation import QueryStats
+from norm.norm_sqlite3 import SQLI_ConnectionFactory as ConnectionFactory
+from norm.norm_sqlite3 import SQLI_SELECT as SELECT
+
+
+def conn_maker():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE foos (val INTEGER)')
+    conn.executemany('INSERT INTO foos VALUES (?)',
+                     [(n,) for n in range(10)])
+    return conn
+
+
+@fixture(autouse=True)
+def no_hooks():
+    yield
+    instrumentation.clear_hooks()
+
+
+def record(*events):
+    seen = []
+    for event in events:
+        instrumentation.add_hook(
+            event, lambda info, event=event: seen.append((event, info)))
+    return seen
+
+
+def test_disabled_without_hooks():
+    assert instrumentation.enabled is False
+    conn = ConnectionFactory(conn_maker)()
+    cur = conn.cursor()
+    cur.execute('SELECT val FROM foos')
+    assert cur._event is None
+
+
+def test_query_events():
+    seen = record(BEFORE_EXECUTE, AFTER_EXECUTE, AFTER_FETCH)
+    conn = ConnectionFactory(conn_maker)()
+
+    s = SELECT('val').FROM('foos').WHERE('val < :limit').bind(limit=4)
+    rows = conn.run_query(s)
+    assert len(rows) == 4
+
+    assert [name for name, event in seen] == [
+        BEFORE_EXECUTE, AFTER_EXECUTE, AFTER_FETCH]
+    event = seen[-1][1]
+    assert all(info is event for name, info in seen)
+    assert event.sql == s.query
+    assert event.bind_count == 1
+    assert event.row_count == 4
+    assert event.compile_time >= 0
+    assert event.execute_time >= 0
+    assert event.fetch_time >= 0
+    assert len(event.fingerprint) == 40
+
+
+def test_error_and_connect_events():
+    seen = record(ON_CONNECT, ON_ERROR)
+    conn = ConnectionFactory(conn_maker)()
+    assert seen[0][0] == ON_CONNECT
+    assert seen[0][1].connect_time >= 0
+
+    with raises(sqlite3.OperationalError):
+        conn.execute('SELECT nope FROM foos')
+    name, event = seen[1]
+    assert name == ON_ERROR
+    assert event.sql == 'SELECT nope FROM foos'
+    assert isinstance(event.error, sqlite3.OperationalError)
+
+    def broken():
+        raise RuntimeError('no database')
+
+    with raises(RuntimeError):
+        ConnectionFactory(broken)()
+    name, event = seen[2]
+    assert name == ON_ERROR
+    assert event.connection_maker is broken
+
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for ms in range(1, 101):
+        h.add(ms / 1000)
+
+    assert h.count == 100
+    assert h.max == 0.1
+    for p in (50, 95, 99):
+        assert p / 1000 <= h.percentile(p) <= p / 1000 * 2 ** (1 / 8)
+    assert Histogram().percentile(50) is None
+
+
+def test_query_stats():
+    stats = QueryStats()
+    stats.install()
+    conn = ConnectionFactory(conn_maker)()
+
+    s = SELECT('val').FROM('foos').WHERE('val = :val')
+    for n in range(10):
+        conn.run_queryone(s.bind(val=n))
+    conn.run_query('SELECT val FROM foos')
+    with raises(sqlite3.OperationalError):
+        conn.run_query('SELECT nope FROM foos')
+
+    report = stats.report()
+    assert len(report) == 3
+    by_query = {entry['query']: entry for entry in report.values()}
+    lookups = by_query[s.query]
+    assert lookups['count'] == 10
+    assert lookups['rows'] == 10
+    assert lookups['p50'] <= lookups['p95'] <= lookups['p99'] <= \
+        lookups['max']
+    assert by_query['SELECT val FROM foos']['rows'] == 10
+    assert by_query['SELECT nope FROM foos']['errors'] == 1
+
+    assert len(stats.slowest(2)) == 2
+    stats.uninstall()
+    assert instrumentation.enabled is False
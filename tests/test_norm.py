@@ -1,5 +1,7 @@
 from datetime import datetime
 
+from pytest import raises
+
 from norm import SELECT
 from norm import UPDATE
 from norm import DELETE
@@ -10,6 +12,11 @@ from norm import WITH
 from norm import EXISTS
 from norm import NOT_EXISTS
 from norm.norm import NormAsIs
+from norm.norm import BogusQuery
+from norm.norm import FROM
+from norm.norm import WHERE
+from norm.norm import compile
+from norm.norm import compile_cache
 
 
 simple_select_query = """\
@@ -528,6 +535,41 @@ def test_generative_query():
     assert s1.binds == {}
 
 
+def test_branching_query():
+    base = SELECT('col1').FROM('table1').WHERE(a=1)
+
+    left = base.WHERE(b=2)
+    right = base.WHERE(c=3).ORDER_BY('col1')
+    left_again = left.WHERE(d=4)
+
+    assert base.query == (
+        'SELECT col1\n'
+        '  FROM table1\n'
+        ' WHERE a = %(a_bind_0)s;')
+    assert base.binds == {'a_bind_0': 1}
+    assert left.binds == {'a_bind_0': 1, 'b_bind_1': 2}
+    assert right.binds == {'a_bind_0': 1, 'c_bind_1': 3}
+    assert left_again.binds == {'a_bind_0': 1, 'b_bind_1': 2, 'd_bind_2': 4}
+    assert right.query == (
+        'SELECT col1\n'
+        '  FROM table1\n'
+        ' WHERE a = %(a_bind_0)s AND\n'
+        '       c = %(c_bind_1)s\n'
+        'ORDER BY col1;')
+    assert len(left_again.build_chain()) == 5
+    assert left_again.bind_len == 3
+
+
+def test_long_where_chain():
+    s = SELECT('col1').FROM('table1')
+    for ix in range(500):
+        s = s.WHERE(col=ix)
+
+    assert s.bind_len == 500
+    assert s.binds['col_bind_499'] == 499
+    assert len(s.build_chain()) == 502
+
+
 simple_update_expected = """\
 UPDATE table1
    SET col1 = 'test',
@@ -748,6 +790,96 @@ def test_asis_insert():
     assert i.binds == {'zipcode_0': 23344}
 
 
+def test_executemany_insert():
+    rows = [{'name': 'Bob', 'zipcode': 23344},
+            {'name': 'Sue'}]
+
+    i = INSERT('table1', data=rows, mode='executemany')
+    assert i.query == ('INSERT INTO table1 (name, zipcode)\n'
+                       '  VALUES\n'
+                       '(%(name)s, %(zipcode)s);')
+    assert list(i.binds) == [{'name': 'Bob', 'zipcode': 23344},
+                             {'name': 'Sue', 'zipcode': None}]
+
+
+def test_executemany_insert_streams_with_columns():
+    rows = ({'name': str(n)} for n in range(3))
+
+    i = INSERT('table1', data=rows, columns=['name'], mode='executemany')
+    assert i.query == ('INSERT INTO table1 (name)\n'
+                       '  VALUES\n'
+                       '(%(name)s);')
+    assert list(i.binds) == [{'name': '0'}, {'name': '1'}, {'name': '2'}]
+
+
+def test_executemany_insert_rejects_asis():
+    i = INSERT('table1',
+               data=[{'name': NormAsIs('now()')}],
+               mode='executemany')
+    with raises(BogusQuery):
+        list(i.binds)
+
+    with raises(BogusQuery):
+        INSERT('table1', mode='executemany')
+
+    with raises(BogusQuery):
+        INSERT('table1', data=[{'name': 'Bob'}], mode='bulk')
+
+
+def test_insert_chunks_by_params():
+    rows = [{'a': n, 'b': n} for n in range(7)]
+
+    chunks = list(INSERT('table1', rows).chunks(max_params=4))
+    assert [len(i.data) for i in chunks] == [2, 2, 2, 1]
+    assert chunks[-1].query == ('INSERT INTO table1 (a, b)\n'
+                                '  VALUES\n'
+                                '(%(a_0)s, %(b_0)s);')
+    assert chunks[-1].binds == {'a_0': 6, 'b_0': 6}
+
+
+def test_insert_chunks_by_rows_and_bytes():
+    rows = ({'a': n} for n in range(5))
+    chunks = list(INSERT('table1', rows, columns=['a']).chunks(max_rows=2))
+    assert [i.data for i in chunks] == [[{'a': 0}, {'a': 1}],
+                                        [{'a': 2}, {'a': 3}],
+                                        [{'a': 4}]]
+
+    rows = [{'a': 'x' * 100}, {'a': 'y'}, {'a': 'z' * 100}]
+    chunks = list(INSERT('table1', rows).chunks(max_bytes=150))
+    assert [len(i.data) for i in chunks] == [2, 1]
+
+
+def test_insert_chunks_mixed_columns():
+    rows = [{'a': 1}, {'a': 2}, {'a': 3, 'b': 3}]
+
+    chunks = list(INSERT('table1', rows).chunks(max_params=3))
+    assert [i.columns for i in chunks] == [['a'], ['a', 'b']]
+    assert [len(i.data) for i in chunks] == [2, 1]
+
+
+def test_insert_chunks_dialect_limits():
+    from norm.norm_pymssql import PYMSSQL_INSERT
+
+    rows = [{'a': n} for n in range(2500)]
+    chunks = list(PYMSSQL_INSERT('table1', rows).chunks())
+    assert [len(i.data) for i in chunks] == [1000, 1000, 500]
+
+    i = INSERT('table1', statement=SELECT('a').FROM('table2'))
+    assert list(i.chunks(max_params=1)) == [i]
+
+
+def test_insert_chunks_default_limits():
+    from norm.norm_myssql_connector import MY_CON_INSERT
+
+    rows = ({'a': n} for n in range(2500))
+    chunks = list(INSERT('table1', rows).chunks())
+    assert [len(i.data) for i in chunks] == [1000, 1000, 500]
+
+    rows = [{f'c{col}': n for col in range(100)} for n in range(1000)]
+    chunks = list(MY_CON_INSERT('table1', rows).chunks())
+    assert [len(i.data) for i in chunks] == [655, 345]
+
+
 test_with_query = """\
 WITH my_fake_table AS
        (UPDATE sometable
@@ -824,6 +956,39 @@ def test_loggable_query():
     assert u._loggable_query == loggable_query_test
 
 
+def test_loggable_query_with_asis_and_similar_names():
+    s = (SELECT('val')
+         .FROM('foos')
+         .WHERE('a = %(val)s AND b = %(val_2)s AND c = %(now)s')
+         .WHERE("d LIKE 'x%%(val)s'")
+         .bind(val=1, val_2='two', now=NormAsIs('now()')))
+
+    assert s.query == ('SELECT val\n'
+                       '  FROM foos\n'
+                       ' WHERE a = %(val)s AND b = %(val_2)s AND c = now() '
+                       'AND\n'
+                       "       d LIKE 'x%%(val)s';")
+    assert s._loggable_query == ('SELECT val\n'
+                                 '  FROM foos\n'
+                                 " WHERE a = 1 AND b = 'two' AND c = now() "
+                                 'AND\n'
+                                 "       d LIKE 'x%%(val)s';")
+
+
+def test_loggable_union():
+    s = SELECT('foo').FROM('my_fake_table').WHERE(foo=1)
+    u = UNION(s, s.WHERE(bar='x'))
+
+    assert u._loggable_query == ('SELECT foo\n'
+                                 '  FROM my_fake_table\n'
+                                 ' WHERE foo = 1\n'
+                                 'UNION\n'
+                                 'SELECT foo\n'
+                                 '  FROM my_fake_table\n'
+                                 ' WHERE foo = 1 AND\n'
+                                 "       bar = 'x';")
+
+
 union_query = """\
 SELECT foo,
        bub,
@@ -899,3 +1064,309 @@ def test_union_all_multi():
 
     assert u.query == union_all_multi_query
     assert u.binds == {'foo_bind_0': 2}
+
+
+def test_fingerprint_ignores_bind_values():
+    s = SELECT('name').FROM('users').WHERE(user_id=1)
+    assert s.fingerprint == SELECT('name').FROM('users').WHERE(
+        user_id=2).fingerprint
+    assert s.bind(extra=5).fingerprint == s.fingerprint
+    assert (UPDATE('users').SET(name='bob').fingerprint ==
+            UPDATE('users').SET(name='joe').fingerprint)
+    assert len(s.fingerprint) == 40
+
+
+def test_fingerprint_differs_by_shape():
+    s = SELECT('name').FROM('users')
+    fingerprints = {
+        s.fingerprint,
+        s.WHERE(user_id=1).fingerprint,
+        s.WHERE(group_id=1).fingerprint,
+        s.WHERE(user_id=1).WHERE(group_id=1).fingerprint,
+        s.ORDER_BY('name').fingerprint,
+        SELECT('name').FROM('groups').fingerprint,
+        EXISTS('name').FROM('users').fingerprint,
+        DELETE('users').fingerprint,
+        s.WHERE('x = %(x)s').bind(x=NormAsIs('now()')).fingerprint,
+        s.WHERE('x = %(x)s').bind(x=NormAsIs('today()')).fingerprint}
+    assert len(fingerprints) == 10
+
+
+def test_insert_fingerprint():
+    one = INSERT('users', [{'name': 'bob', 'age': 5}])
+    many = INSERT('users', [{'name': 'joe', 'age': n} for n in range(50)])
+    assert one.fingerprint == many.fingerprint
+
+    assert one.fingerprint != INSERT('users', [{'name': 'bob'}]).fingerprint
+    assert one.fingerprint != INSERT('groups', [{'name': 'bob'}]).fingerprint
+    assert one.fingerprint != INSERT('users', [{'name': 'bob', 'age': 5}],
+                                     returning='user_id').fingerprint
+    assert one.fingerprint != INSERT('users', [{'name': 'bob', 'age': 5}],
+                                     mode='executemany').fingerprint
+
+    now = INSERT('users', [{'name': 'bob', 'age': NormAsIs('now()')}])
+    today = INSERT('users', [{'name': 'bob', 'age': NormAsIs('today()')}])
+    assert now.fingerprint != one.fingerprint
+    assert now.fingerprint != today.fingerprint
+    assert now.fingerprint == INSERT(
+        'users', [{'name': 'joe', 'age': NormAsIs('now()')}] * 3).fingerprint
+    assert now.fingerprint == INSERT(
+        'users', {'name': 'joe', 'age': NormAsIs('now()')}).fingerprint
+
+    copy = INSERT('users', columns=['name'],
+                  statement=SELECT('name').FROM('people'))
+    assert copy.fingerprint == INSERT(
+        'users', columns=['name'],
+        statement=SELECT('name').FROM('people')).fingerprint
+    assert copy.fingerprint != INSERT(
+        'users', columns=['name'],
+        statement=SELECT('name').FROM('staff')).fingerprint
+
+
+def test_with_union_fingerprint():
+    a = SELECT('a').FROM('t').WHERE(a=1)
+    b = SELECT('b').FROM('t')
+
+    assert UNION(a, b).fingerprint == UNION(a.bind(x=2), b).fingerprint
+    assert UNION(a, b).fingerprint != UNION(b, a).fingerprint
+    assert UNION(a, b).fingerprint != UNION_ALL(a, b).fingerprint
+
+    w = WITH(x=a)(b)
+    assert w.fingerprint == WITH(x=SELECT('a').FROM('t').WHERE(a=5))(
+        b).fingerprint
+    assert w.fingerprint != WITH(y=a)(b).fingerprint
+
+
+def test_fingerprint_stable_across_processes():
+    import os
+    import subprocess
+    import sys
+    import norm
+
+    script = ('from norm import SELECT, INSERT\n'
+              "print(SELECT('name').FROM('users').WHERE(user_id=1)"
+              '.fingerprint)\n'
+              "print(INSERT('users', [{'name': 'bob', 'age': 5}])"
+              '.fingerprint)\n')
+    expected = [SELECT('name').FROM('users').WHERE(user_id=7).fingerprint,
+                INSERT('users', [{'name': 'x', 'age': 1}]).fingerprint]
+    for seed in ('1', '2'):
+        env = dict(os.environ,
+                   PYTHONHASHSEED=seed,
+                   PYTHONPATH=os.path.dirname(os.path.dirname(norm.__file__)))
+        out = subprocess.run([sys.executable, '-c', script],
+                             env=env,
+                             check=True,
+                             capture_output=True,
+                             text=True).stdout.split()
+        assert out == expected
+
+
+def test_loggable_exists():
+    e = NOT_EXISTS('1').FROM('t').WHERE(a='x')
+    assert e._loggable_query == ("NOT EXISTS (\n"
+                                 "  SELECT 1\n"
+                                 "    FROM t\n"
+                                 "   WHERE a = 'x')")
+
+
+def test_table_names():
+    s = (SELECT('u.name')
+         .FROM('Users AS u', '"Public"."Groups" g')
+         .JOIN('memberships m', ON='m.user_id = u.user_id')
+         .WHERE('u.team_id IN (SELECT team_id FROM teams)'))
+    assert s.table_names == {'users', 'groups', 'memberships', 'teams'}
+
+    assert UPDATE('users').SET(name='bob').table_names == {'users'}
+    assert DELETE('dbo.users').WHERE(user_id=1).table_names == {'users'}
+    assert UPDATE('users u').SET(name='bob').table_names == {'users'}
+    assert UPDATE('public.users AS u').SET(
+        name='bob').table_names == {'users'}
+    assert DELETE('users u').WHERE(user_id=1).table_names == {'users'}
+    assert INSERT('users', {'name': 'bob'}).table_names == {'users'}
+    assert UNION(SELECT('a').FROM('x'),
+                 SELECT('a').FROM('y')).table_names == {'x', 'y'}
+    assert WITH(t=SELECT('a').FROM('x'))(
+        SELECT('a').FROM('t')).table_names == {'x', 't'}
+
+
+def test_query_nodes_have_no_dict():
+    from norm.norm_psycopg2 import PG_SELECT
+    from norm.norm_pymssql import PYMSSQL_UPDATE
+
+    root = SELECT('name')
+    s = root.FROM('users').WHERE(user_id=1)
+    for q in (root,
+              s,
+              UPDATE('users').SET(name='bob'),
+              DELETE('users'),
+              PG_SELECT('name').FROM('users'),
+              PYMSSQL_UPDATE('users').SET(name='bob'),
+              UNION(s, s),
+              WITH(u=s)(SELECT('name').FROM('u'))):
+        assert not hasattr(q, '__dict__')
+
+    # the root and its child do not share a list
+    assert root.binds == {}
+    assert s.binds == {'user_id_bind_0': 1}
+    assert root.query == 'SELECT name;'
+
+
+def test_template():
+    s = (SELECT('name')
+         .FROM('users')
+         .WHERE('user_id = %(user_id)s')
+         .WHERE('team_id = %(team_id)s OR %(team_id)s IS NULL')
+         .WHERE('status = %(status)s')
+         .bind(status='active', deleted=NormAsIs('false')))
+    t = s.template()
+
+    assert t.query == s.query
+    assert t.bind_names == ('user_id', 'team_id', 'status')
+    assert dict(t.defaults) == {'status': 'active'}
+    assert t.binds_for({'user_id': 1, 'team_id': None}) == {
+        'user_id': 1, 'team_id': None, 'status': 'active'}
+    assert t.binds_for({'user_id': 1, 'team_id': 2, 'status': 'x'}) == {
+        'user_id': 1, 'team_id': 2, 'status': 'x'}
+
+    with raises(BogusQuery):
+        t.binds_for({'user_id': 1})
+    with raises(BogusQuery):
+        t.binds_for({'user_id': 1, 'team_id': 2, 'user': 3})
+    with raises(AttributeError):
+        t.query = 'SELECT 1;'
+    with raises(TypeError):
+        t.defaults['status'] = 'x'
+
+
+def test_template_asis():
+    u = (UPDATE('users')
+         .SET('updated = %(now)s')
+         .WHERE(user_id=5)
+         .bind(now=NormAsIs('NOW()')))
+    t = u.template()
+    assert t.query == u.query
+    assert 'NOW()' in t.query
+    assert t.bind_names == ('user_id_bind_0',)
+    assert dict(t.defaults) == {'user_id_bind_0': 5}
+
+
+def test_insert_template():
+    t = INSERT('users',
+               {'name': 'bob', 'created': NormAsIs('NOW()')}).template()
+    assert t.query == ('INSERT INTO users (created, name)\n'
+                       '  VALUES\n'
+                       '(NOW(), %(name)s);')
+    assert t.bind_names == ('name',)
+    assert t.binds_for({}) == {'name': 'bob'}
+
+    t = INSERT('users', [{'name': 'bob'}, {'email': 'x'}]).template()
+    assert t.bind_names == ('email', 'name')
+    assert dict(t.defaults) == {}
+    with raises(BogusQuery):
+        t.binds_for({'name': 'bob'})
+
+
+def test_compile_matches_indent_string():
+    s = (SELECT('a', 'b')
+         .FROM('t1')
+         .JOIN('t2', ON='t2.id = t1.id')
+         .FROM('t3')
+         .WHERE('a = 1')
+         .WHERE('(b = 2 OR\nb = 3)\r\n')
+         .WHERE('c = 4')
+         .LIMIT(5)
+         .LIMIT(None))
+    assert s.query == ('SELECT a,\n'
+                       '       b\n'
+                       '  FROM t1\n'
+                       '  JOIN t2\n'
+                       '       ON t2.id = t1.id,\n'
+                       '       t3\n'
+                       ' WHERE a = 1 AND\n'
+                       '       (b = 2 OR\n'
+                       '       b = 3)\n'
+                       '        AND\n'
+                       '       c = 4;')
+
+    with raises(BogusQuery):
+        SELECT('a').JOIN('t2', ON='t2.id = 1').query
+    with raises(BogusQuery):
+        UPDATE().SET(a=1).query
+
+
+def test_incremental_compile():
+    compile_cache.clear()
+    base = (SELECT('u.user_id', 'u.name')
+            .FROM('users AS u')
+            .JOIN('teams AS t', ON='t.team_id = u.team_id')
+            .WHERE('u.active'))
+    base.query
+
+    child = base.WHERE(team_id=3).ORDER_BY('u.name').LIMIT(10)
+    sibling = base.WHERE('(u.a OR\n u.b)').LIMIT(5).LIMIT(None)
+    bound = sibling.bind(x=1)
+    for q in (child, sibling, bound, base.SELECT('t.name')):
+        assert q.query == compile(q.build_chain(), q.query_type)
+
+    # the sections the children left alone were rendered once, by base
+    assert child._fragments[FROM] is base._fragments[FROM]
+    assert sibling._fragments[FROM] is base._fragments[FROM]
+    assert child._fragments[WHERE] is not base._fragments[WHERE]
+    assert base._sections[WHERE] == ['u.active']
+
+    # a child with only new binds shares its parent's sections
+    compile_cache.clear()
+    bound = sibling.bind(y=2)
+    bound.query
+    assert bound._sections is sibling._sections
+
+    u = UPDATE('users').SET(name='bob')
+    u.query
+    u2 = u.SET(team_id=2).WHERE(user_id=1).RETURNING('user_id')
+    assert u2.query == compile(u2.build_chain(), u2.query_type)
+
+
+def test_incremental_compile_from_branch():
+    compile_cache.clear()
+    base = SELECT('name').FROM('users').JOIN('teams', USING='team_id')
+    first = base.WHERE('a = 1').LIMIT(1)
+    second = base.WHERE('b = 2').LIMIT(2)
+    third = base.WHERE('c = 3')
+    for q in (first, second, third):
+        assert q.query == compile(q.build_chain(), q.query_type)
+
+    # base was never compiled itself, but it was branched from
+    assert second._fragments[FROM] is base._fragments[FROM]
+    assert third._fragments[FROM] is base._fragments[FROM]
+
+
+def test_where_in():
+    s = SELECT('name').FROM('users').WHERE(team_id=1)
+    q = s.WHERE_IN('users.user_id', (ix for ix in range(3)))
+    assert q.query == ('SELECT name\n'
+                       '  FROM users\n'
+                       ' WHERE team_id = %(team_id_bind_0)s AND\n'
+                       '       users.user_id IN (%(users___user_id_in_1_0)s, '
+                       '%(users___user_id_in_1_1)s, '
+                       '%(users___user_id_in_1_2)s);')
+    assert q.binds == {'team_id_bind_0': 1,
+                       'users___user_id_in_1_0': 0,
+                       'users___user_id_in_1_1': 1,
+                       'users___user_id_in_1_2': 2}
+
+    assert s.WHERE_IN('user_id', []).query == (
+        'SELECT name\n'
+        '  FROM users\n'
+        ' WHERE team_id = %(team_id_bind_0)s AND\n'
+        '       1 = 0;')
+
+    q = SELECT('name').FROM('users').WHERE_IN('lower(email)', ['a@b.c'])
+    assert q.query == ('SELECT name\n'
+                       '  FROM users\n'
+                       ' WHERE lower(email) IN (%(lower_email__in_0_0)s);')
+    assert q.binds == {'lower_email__in_0_0': 'a@b.c'}
+
+    d = DELETE('users').WHERE_IN('user_id', [5])
+    assert d.query == ('DELETE FROM users\n'
+                       ' WHERE user_id IN (%(user_id_in_0_0)s);')
@@ -0,0 +1,158 @@
+from threading import Thread
+from time import sleep
+import sqlite3
+
+from pytest import raises
+
+from norm.connection import PoolTimeout
+from norm.norm_sqlite3 import SQLI_ConnectionProxy
+from norm.norm_sqlite3 import SQLI_PooledConnectionFactory as PooledFactory
+
+connect_count = 0
+
+
+def conn_maker():
+    global connect_count
+    connect_count += 1
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+def test_reuses_connections():
+    pool = PooledFactory(conn_maker, max_size=2)
+
+    conn = pool()
+    assert isinstance(conn, SQLI_ConnectionProxy)
+    pool.release(conn)
+    assert pool() is conn
+    assert pool.size == 1
+
+
+def test_close_returns_to_pool():
+    pool = PooledFactory(conn_maker, max_size=2, checkout_timeout=0.05)
+
+    for _ in range(3):
+        conn = pool()
+        conn.run_queryone('SELECT 1 AS one')
+        conn.close()
+    assert pool.size == 1
+    assert pool.idle == 1
+
+    # closing twice, or after the context manager, changes nothing
+    conn.close()
+    with pool.connection() as conn:
+        conn.close()
+    assert pool.idle == 1
+
+    pool.close()
+    with raises(sqlite3.ProgrammingError):
+        conn.conn.execute('SELECT 1')
+
+
+def test_min_size_and_context_manager():
+    pool = PooledFactory(conn_maker, min_size=2, max_size=3)
+    assert pool.size == 2
+    assert pool.idle == 2
+
+    with pool.connection() as conn:
+        assert conn.run_queryone('SELECT 1 AS one') == {'one': 1}
+        assert pool.idle == 1
+    assert pool.idle == 2
+
+    with raises(ZeroDivisionError):
+        with pool.connection() as conn:
+            1 / 0
+    assert pool.idle == 2
+
+
+def test_max_size_and_checkout_timeout():
+    pool = PooledFactory(conn_maker, max_size=1, checkout_timeout=0.05)
+
+    conn = pool()
+    with raises(PoolTimeout):
+        pool()
+
+    def give_back():
+        sleep(0.01)
+        pool.release(conn)
+
+    pool.checkout_timeout = 5
+    Thread(target=give_back).start()
+    assert pool() is conn
+
+
+def test_idle_timeout_and_max_lifetime():
+    pool = PooledFactory(conn_maker, idle_timeout=0.01)
+    conn = pool()
+    pool.release(conn)
+    sleep(0.02)
+    assert pool() is not conn
+    assert pool.size == 1
+
+    pool = PooledFactory(conn_maker, max_lifetime=0.01)
+    conn = pool()
+    sleep(0.02)
+    pool.release(conn)
+    assert pool.size == 0
+    assert pool.idle == 0
+
+
+def test_culled_connections_are_replaced_up_to_min_size():
+    pool = PooledFactory(conn_maker, min_size=3, idle_timeout=0.05)
+    sleep(0.1)
+    conn = pool()
+    assert pool.size == 3
+    assert pool.idle == 2
+    pool.release(conn)
+    assert pool.size == 3
+
+    pool = PooledFactory(conn_maker, min_size=1, max_lifetime=0.01)
+    conn = pool()
+    sleep(0.02)
+    pool.release(conn)
+    assert pool.size == 1
+    assert pool.idle == 1
+    assert pool() is not conn
+
+
+def test_health_check_replaces_broken_connections():
+    pool = PooledFactory(conn_maker)
+    conn = pool()
+    pool.release(conn)
+    conn.conn.close()
+
+    fresh = pool()
+    assert fresh is not conn
+    assert fresh.run_queryone('SELECT 1 AS one') == {'one': 1}
+    assert pool.size == 1
+
+
+def test_threaded_checkout():
+    start_count = connect_count
+    pool = PooledFactory(conn_maker, max_size=3)
+    errors = []
+
+    def work():
+        try:
+            for _ in range(50):
+                with pool.connection() as conn:
+                    assert conn.run_queryone('SELECT 1 AS one') == {'one': 1}
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert pool.size <= 3
+    assert connect_count - start_count <= 3
+
+
+def test_close():
+    pool = PooledFactory(conn_maker, min_size=2)
+    pool.close()
+    assert pool.size == 0
+    with raises(RuntimeError):
+        pool()
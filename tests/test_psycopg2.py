@@ -0,0 +1,168 @@
+from pytest import importorskip
+from pytest import raises
+
+importorskip('psycopg2')
+
+from norm import instrumentation  # noqa: E402
+from norm.instrumentation import AFTER_EXECUTE  # noqa: E402
+from norm.norm import BogusQuery  # noqa: E402
+from norm.norm_psycopg2 import DEFAULT  # noqa: E402
+from norm.norm_psycopg2 import PG_COPY  # noqa: E402
+from norm.norm_psycopg2 import PG_ConnectionFactory  # noqa: E402
+from norm.norm_psycopg2 import PG_INSERT  # noqa: E402
+from norm.norm_psycopg2 import PG_SELECT  # noqa: E402
+from norm.norm_psycopg2 import PG_UPDATE  # noqa: E402
+
+rows = [{'id': 1, 'name': 'tab\there', 'data': b'\x01\xff'},
+        {'id': 2, 'name': 'back\\slash\nnewline', 'active': True},
+        {'id': 3, 'name': None, 'active': False}]
+
+
+def test_copy_query():
+    c = PG_COPY('my_table', rows)
+
+    assert c.query == 'COPY my_table (active, data, id, name) FROM STDIN'
+    assert c.binds == {}
+
+
+def test_copy_encoding():
+    c = PG_COPY('my_table', rows)
+
+    assert ''.join(c.encoded_chunks()) == (
+        '\\N\t\\\\x01ff\t1\ttab\\there\n'
+        't\t\\N\t2\tback\\\\slash\\nnewline\n'
+        'f\t\\N\t3\t\\N\n')
+
+
+def test_copy_reader_chunks():
+    c = PG_COPY('my_table',
+                ({'id': n} for n in range(1000)),
+                columns=['id'],
+                buffer_size=100)
+
+    chunks = list(c.encoded_chunks())
+    assert len(chunks) > 1
+    assert all(len(chunk) < 110 for chunk in chunks)
+
+    c = PG_COPY('my_table', [{'id': n} for n in range(1000)])
+    reader = c.reader()
+    assert reader.read(4) == '0\n1\n'
+    assert reader.read().endswith('998\n999\n')
+    assert reader.read(10) == ''
+
+
+def test_copy_rejects_literal_sql():
+    c = PG_COPY('my_table', [{'id': 1}], columns=['id', 'name'],
+                default=DEFAULT)
+
+    with raises(BogusQuery):
+        list(c.encoded_chunks())
+
+
+class FakeCursor(object):
+    def __init__(self, log):
+        self.log = log
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.log = []
+
+    def cursor(self, *args, **kw):
+        return FakeCursor(self.log)
+
+
+def test_prepared_statements():
+    conn = PG_ConnectionFactory(FakeConnection, prepared_statements=2)()
+    log = conn.conn.log
+
+    s = (PG_SELECT('name')
+         .FROM('users')
+         .WHERE(user_id=5)
+         .WHERE("name LIKE 'b%%' OR alias = %(alias)s")
+         .bind(alias='bob'))
+    conn.execute(s)
+    conn.execute(s.bind(alias='joe'))
+
+    name = conn.prepared.get(s.query)[0]
+    assert log == [
+        (f'PREPARE {name} AS SELECT name\n'
+         '  FROM users\n'
+         ' WHERE user_id = $1 AND\n'
+         "       name LIKE 'b%' OR alias = $2", None),
+        (f'EXECUTE {name} (%s, %s)', [5, 'bob']),
+        (f'EXECUTE {name} (%s, %s)', [5, 'joe'])]
+
+
+def test_prepared_statements_eviction():
+    conn = PG_ConnectionFactory(FakeConnection, prepared_statements=2)()
+    log = conn.conn.log
+
+    queries = [PG_SELECT('name').FROM(table) for table in ('a', 'b', 'c')]
+    for q in queries:
+        conn.execute(q)
+    first = log[0][0].split()[1]
+    assert (f'DEALLOCATE {first}', None) in log
+    assert queries[0].query not in conn.prepared
+    assert len(conn.prepared) == 2
+
+
+def test_prepared_statements_skip_literal_sql():
+    conn = PG_ConnectionFactory(FakeConnection, prepared_statements=2)()
+    log = conn.conn.log
+
+    conn.execute(PG_SELECT('name').FROM('users')
+                 .WHERE('user_id IN %(ids)s').bind(ids=(1, 2)))
+    conn.execute(PG_UPDATE('users').SET(name=DEFAULT))
+    conn.execute('SELECT 1')
+    assert not any(sql.startswith('PREPARE') for sql, params in log)
+    assert len(conn.prepared) == 0
+
+
+def test_prepared_statements_off_by_default():
+    conn = PG_ConnectionFactory(FakeConnection)()
+    conn.execute(PG_SELECT('name').FROM('users').WHERE(user_id=1))
+    assert conn.prepared is None
+    assert conn.conn.log[0][0].startswith('SELECT name')
+
+
+def test_where_in_any():
+    ids = list(range(10000))
+    s = PG_SELECT('name').FROM('users').WHERE_IN('user_id', ids)
+    assert s.query == ('SELECT name\n'
+                       '  FROM users\n'
+                       ' WHERE user_id = ANY(%(user_id_in_0)s);')
+    assert s.binds == {'user_id_in_0': ids}
+
+    u = PG_UPDATE('users').SET(active=False).WHERE_IN('user_id', [])
+    assert u.query.endswith(' WHERE 1 = 0;')
+
+
+def test_execute_values_instrumented(monkeypatch):
+    pages = []
+    monkeypatch.setattr('norm.norm_psycopg2.execute_values',
+                        lambda cur, sql, rows, template, page_size:
+                        pages.append((sql, list(rows), template, page_size)))
+    seen = []
+    instrumentation.add_hook(AFTER_EXECUTE, seen.append)
+    try:
+        conn = PG_ConnectionFactory(FakeConnection)()
+        i = PG_INSERT('users', [{'name': 'bob'}], mode='executemany')
+        conn.executemany(i, page_size=10)
+    finally:
+        instrumentation.clear_hooks()
+
+    assert pages == [('INSERT INTO users (name)\n  VALUES %s;',
+                      [{'name': 'bob'}],
+                      '(%(name)s)',
+                      10)]
+    assert len(seen) == 1
+    assert seen[0].sql == pages[0][0]
+    assert seen[0].execute_time >= 0
@@ -1,6 +1,7 @@
 from pytest import raises
 
 from norm.norm_pymssql import PYMSSQL_INSERT as INSERT
+from norm.norm_pymssql import PYMSSQL_SELECT
 
 rows = [{'test': 'good', 'bub': 5}]
 
@@ -27,3 +28,38 @@ def test_encrypted_insert():
 def test_error_on_no_key():
     with raises(RuntimeError):
         INSERT('my_table', rows, encrypted_columns=['bub'])
+
+
+def test_where_in_bind_limit():
+    class SELECT(PYMSSQL_SELECT):
+        __slots__ = ()
+        max_bind_params = 8
+        in_bind_headroom = 2
+
+    s = SELECT('name').FROM('users').WHERE_IN('id', [1, 2, 3])
+    assert s.query == ('SELECT name\n'
+                       '  FROM users\n'
+                       ' WHERE id IN (%(id_in_0_0)s, %(id_in_0_1)s, '
+                       '%(id_in_0_2)s);')
+    assert s.binds == {'id_in_0_0': 1, 'id_in_0_1': 2, 'id_in_0_2': 3}
+
+    s = SELECT('name').FROM('users').WHERE_IN('id', range(7))
+    assert s.query == ('SELECT name\n'
+                       '  FROM users\n'
+                       ' WHERE id IN (SELECT value FROM '
+                       'OPENJSON(%(id_in_0)s));')
+    assert s.binds == {'id_in_0': '[0, 1, 2, 3, 4, 5, 6]'}
+
+    # binds already in the query count against the limit
+    s = SELECT('name').FROM('users').WHERE(a=1, b=2).WHERE_IN('id', range(5))
+    assert s.binds == {'a_bind_0': 1, 'b_bind_1': 2,
+                       'id_in_2': '[0, 1, 2, 3, 4]'}
+
+
+def test_where_in_default_limits():
+    s = PYMSSQL_SELECT('name').FROM('users').WHERE_IN('id', range(1500))
+    assert s.query.count(' IN (') == 1
+    assert len(s.binds) == 1500
+
+    s = PYMSSQL_SELECT('name').FROM('users').WHERE_IN('id', range(2100))
+    assert len(s.binds) == 1
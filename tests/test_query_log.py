@@ -0,0 +1,99 @@
+import logging
+import sqlite3
+import threading
+
+import norm
+from norm import query_log
+from norm.norm_sqlite3 import SQLI_ConnectionFactory as ConnectionFactory
+from norm.norm_sqlite3 import SQLI_SELECT
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+class TrackedSELECT(SQLI_SELECT):
+    rendered_on = []
+
+    @property
+    def _loggable_query(self):
+        self.rendered_on.append(threading.current_thread())
+        return super()._loggable_query
+
+
+def run_logged(monkeypatch, **settings):
+    monkeypatch.setattr(norm, 'enable_logging', True)
+    for name, value in settings.items():
+        monkeypatch.setattr(norm, name, value)
+
+    handler = ListHandler()
+    query_log.start_listener(handler)
+    try:
+        conn = ConnectionFactory(lambda: sqlite3.connect(':memory:'))()
+        conn.run_query(TrackedSELECT('1 AS one').WHERE(one=1))
+    finally:
+        query_log.stop_listener()
+    return handler.messages
+
+
+def test_query_rendered_on_listener_thread(monkeypatch):
+    TrackedSELECT.rendered_on.clear()
+    messages = run_logged(monkeypatch)
+
+    assert any(message.endswith('SELECT 1 AS one\n WHERE one = 1;\n')
+               for message in messages)
+    assert len(TrackedSELECT.rendered_on) == 1
+    assert TrackedSELECT.rendered_on[0] is not threading.current_thread()
+
+
+def test_fast_queries_not_logged(monkeypatch):
+    TrackedSELECT.rendered_on.clear()
+    messages = run_logged(monkeypatch, slow_query_ms=60 * 1000)
+
+    assert not any('Query took' in message for message in messages)
+    assert TrackedSELECT.rendered_on == []
+
+
+def test_sample_rate(monkeypatch):
+    TrackedSELECT.rendered_on.clear()
+    messages = run_logged(monkeypatch, log_sample_rate=0)
+
+    assert not any('Query took' in message for message in messages)
+    assert TrackedSELECT.rendered_on == []
+
+
+def test_logged_to_root_handler(monkeypatch):
+    monkeypatch.setattr(norm, 'enable_logging', True)
+    monkeypatch.setattr(query_log.logger, 'level', logging.NOTSET)
+    root = logging.getLogger()
+    root_handler = ListHandler()
+    monkeypatch.setattr(root, 'handlers', [root_handler])
+
+    for level in (logging.INFO, logging.WARNING):
+        monkeypatch.setattr(root, 'level', level)
+        conn = ConnectionFactory(lambda: sqlite3.connect(':memory:'))()
+        conn.run_query(SQLI_SELECT('1 AS one'))
+
+    assert query_log._listener is None
+    assert len([message for message in root_handler.messages
+                if 'Query took' in message]) == 2
+
+
+def test_lazy_query_truncates(monkeypatch):
+    monkeypatch.setattr(norm, 'max_query_log_length', 5)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return 'SELECT 1;'
+
+    lazy = query_log.LazyQuery(render)
+    assert calls == []
+    assert str(lazy) == 'SELEC'
+    assert str(lazy) == 'SELEC'
+    assert calls == [1]
@@ -1,5 +1,7 @@
 from __future__ import unicode_literals
 
+from pytest import importorskip
+
 from norm import RowsProxy
 
 column_names = ('user_id', 'opponent_name', 'game_id', 'score')
@@ -48,3 +50,105 @@ def test_grouping():
         (6, 'Gabe'),
         (6, 'Ted'),
         (7, 'Jim')]
+
+
+def test_records():
+    rp = RowsProxy(make_rows(), column_names)
+
+    records = list(rp.records())
+    assert len(records) == 8
+    first = records[0]
+    assert first['opponent_name'] == 'John'
+    assert first.get('score') == 34.14
+    assert first.get('missing') is None
+    assert 'game_id' in first
+    assert first == {'user_id': 5,
+                     'opponent_name': 'John',
+                     'game_id': 55,
+                     'score': 34.14}
+    assert dict(records[-1]) == {'user_id': 7,
+                                 'opponent_name': 'Jim',
+                                 'game_id': 27,
+                                 'score': 8.14}
+    assert type(first) is type(records[-1])
+    assert not hasattr(first, '__dict__')
+
+
+def test_columns():
+    rp = RowsProxy(make_rows(), column_names)
+
+    columns = rp.columns()
+    assert list(columns) == list(column_names)
+    assert columns['user_id'] == [5, 5, 5, 5, 6, 6, 6, 7]
+
+    columns = rp.columns(typecodes={'score': 'd', 'game_id': 'l'})
+    assert columns['score'].typecode == 'd'
+    assert list(columns['game_id']) == [55, 57, 59, 60, 95, 31, 5, 27]
+    assert columns['opponent_name'][-1] == 'Jim'
+
+    assert RowsProxy([], column_names).columns() == {
+        name: [] for name in column_names}
+    assert RowsProxy([{'a': 1}, {'a': 2}]).columns() == {'a': [1, 2]}
+
+
+def test_to_numpy():
+    numpy = importorskip('numpy')
+    rows = make_rows() + [(None, None, None, None)]
+    rp = RowsProxy(rows, column_names)
+
+    result = rp.to_numpy()
+    assert result.dtype.names == column_names
+    assert result['user_id'].dtype == numpy.dtype('f8')
+    assert result['opponent_name'].dtype == numpy.dtype('O')
+    assert result['score'][0] == 34.14
+    assert numpy.isnan(result['score'][-1])
+
+    result = RowsProxy(make_rows(), column_names).to_numpy(
+        dtypes={'opponent_name': 'U8'})
+    assert result['game_id'].dtype == numpy.dtype('i8')
+    assert list(result['opponent_name'][:3]) == ['John', 'John', 'Dirk']
+    assert len(RowsProxy([], column_names).to_numpy()) == 0
+
+
+def test_group_by():
+    rows = make_rows()
+    rows.append((5, 'John', 99, 1.5))
+    rp = RowsProxy(rows, column_names)
+
+    by_user = rp.group_by('user_id')
+    assert list(by_user) == [5, 6, 7]
+    assert [row['score'] for row in by_user[5]] == [
+        34.14, 35.14, 37.14, 38.14, 1.5]
+    assert len(by_user[7]) == 1
+    assert rp.group_by('user_id') is by_user
+
+    games = rp.group_by('user_id', 'opponent_name')
+    assert [row['game_id'] for row in games[(5, 'John')]] == [55, 57, 99]
+    assert (8, 'Nobody') not in games
+
+    ordered = rp.group_by('opponent_name', sorted=True)
+    assert list(ordered) == ['Dirk', 'Gabe', 'Jim', 'John', 'Ted']
+
+    dict_rows = RowsProxy(iter(list(rp)))
+    assert len(dict_rows.group_by('user_id')[6]) == 3
+
+
+def test_group_by_sorted_with_nulls():
+    rp = RowsProxy([(2, None), (None, 'a'), (1, 'b'), (2, 'a'), (None, None)],
+                   ['x', 'y'])
+    assert list(rp.group_by('x', sorted=True)) == [1, 2, None]
+    assert list(rp.group_by('x', 'y', sorted=True)) == [
+        (1, 'b'), (2, 'a'), (2, None), (None, 'a'), (None, None)]
+
+
+def test_index_by():
+    rp = RowsProxy(make_rows(), column_names)
+
+    games = rp.index_by('game_id')
+    assert len(games) == 8
+    assert games[95] == {'user_id': 6,
+                         'opponent_name': 'Gabe',
+                         'game_id': 95,
+                         'score': 32.14}
+    assert games.get(1000) is None
+    assert rp.index_by('user_id')[5]['game_id'] == 60